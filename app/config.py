@@ -0,0 +1,41 @@
+"""
+Process configuration.
+
+The .env file is read and logging is configured once, the first time this
+module is imported. Modules read their settings through `settings` at
+import time instead of loading the environment themselves.
+"""
+import os
+import logging
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+class Settings:
+    """
+    Typed access to environment variables; unset or empty variables fall
+    back to the default
+    """
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return os.getenv(name) or default
+
+    def get_int(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        value = os.getenv(name)
+        return int(value) if value else default
+
+    def get_float(self, name: str, default: Optional[float] = None) -> Optional[float]:
+        value = os.getenv(name)
+        return float(value) if value else default
+
+    def get_bool(self, name: str, default: bool = False) -> bool:
+        value = os.getenv(name)
+        return value.lower() in TRUE_VALUES if value else default
+
+
+settings = Settings()
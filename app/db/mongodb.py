@@ -1,18 +1,35 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
-import os
-from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure
 import logging
+from app.db.monitoring import command_stats_listener, pool_stats_listener
+from app.services.tracing import traced_collection
+from app.config import settings
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+MONGO_URI = settings.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = settings.get("DB_NAME", "planeit_db")
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "planeit_db")
+# Client options; unset ones keep the driver defaults
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": settings.get_int("MONGO_MAX_POOL_SIZE"),
+    "minPoolSize": settings.get_int("MONGO_MIN_POOL_SIZE"),
+    "maxIdleTimeMS": settings.get_int("MONGO_MAX_IDLE_TIME_MS"),
+    "waitQueueTimeoutMS": settings.get_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    "serverSelectionTimeoutMS": settings.get_int("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+    "connectTimeoutMS": settings.get_int("MONGO_CONNECT_TIMEOUT_MS"),
+    "socketTimeoutMS": settings.get_int("MONGO_SOCKET_TIMEOUT_MS"),
+}
+# Comma-separated wire compressors, e.g. "zstd,snappy,zlib"
+MONGO_COMPRESSORS = settings.get("MONGO_COMPRESSORS")
+
+def client_options():
+    """Build the AsyncIOMotorClient keyword arguments from the environment."""
+    options = {name: value for name, value in MONGO_CLIENT_OPTIONS.items() if value is not None}
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    options["event_listeners"] = [command_stats_listener, pool_stats_listener]
+    return options
 
 # MongoDB client instance
 client = None
@@ -21,8 +38,10 @@ db = None
 async def connect_to_mongo():
     """Connect to MongoDB."""
     global client, db
+    # Imported on connect so that importing the app stays cheap
+    from motor.motor_asyncio import AsyncIOMotorClient
     try:
-        client = AsyncIOMotorClient(MONGO_URI)
+        client = AsyncIOMotorClient(MONGO_URI, **client_options())
         # The ismaster command is cheap and does not require auth
         await client.admin.command('ismaster')
         db = client[DB_NAME]
@@ -31,6 +50,39 @@ async def connect_to_mongo():
         logger.error(f"MongoDB connection failed: {e}")
         raise
 
+# Covers the /plan/{code}/status lookup: every projected field is in the
+# index, so it's answered without reading plan documents
+PLAN_STATUS_INDEX = [
+    ("code", ASCENDING),
+    ("member_count", ASCENDING),
+    ("quiz_completed_count", ASCENDING),
+    ("voted_count", ASCENDING),
+    ("total_likes", ASCENDING),
+    ("version", ASCENDING),
+]
+
+async def ensure_indexes():
+    """Create the indexes used by the hot query paths."""
+    indexes = [
+        ("users", [("email", ASCENDING)], {"unique": True}),
+        ("plans", [("code", ASCENDING)], {"unique": True}),
+        ("plans", [("users.email", ASCENDING)], {}),
+        ("plans", [("last_activity_at", DESCENDING)], {}),
+        ("plans", PLAN_STATUS_INDEX, {}),
+        ("destinations", [("airport_code", ASCENDING)], {}),
+        ("quiz_jobs", [("email", ASCENDING), ("code", ASCENDING)], {"unique": True}),
+        ("quiz_jobs", [("job_id", ASCENDING)], {"unique": True}),
+        ("quiz_jobs", [("status", ASCENDING), ("available_at", ASCENDING)], {}),
+        ("quiz_jobs", [("status", ASCENDING), ("lease_until", ASCENDING)], {}),
+    ]
+    for collection_name, keys, options in indexes:
+        try:
+            await db[collection_name].create_index(keys, **options)
+        except OperationFailure as e:
+            # e.g. existing duplicates blocking a unique index; keep serving
+            logger.error(f"Could not create index {keys} on {collection_name}: {e}")
+    logger.info("MongoDB indexes ensured")
+
 async def close_mongo_connection():
     """Close MongoDB connection."""
     global client
@@ -40,7 +92,7 @@ async def close_mongo_connection():
 
 # Database collections
 def get_collection(collection_name):
-    return db[collection_name]
+    return traced_collection(db[collection_name])
 
 # Collection getters
 def get_users_collection():
@@ -50,4 +102,16 @@ def get_plans_collection():
     return get_collection("plans")
 
 def get_destinations_collection():
-    return get_collection("destinations") 
\ No newline at end of file
+    return get_collection("destinations") 
+
+def get_flight_prices_collection():
+    return get_collection("flight_prices")
+
+def get_catalogue_meta_collection():
+    return get_collection("catalogue_meta")
+
+def get_jobs_collection():
+    return get_collection("jobs")
+
+def get_quiz_jobs_collection():
+    return get_collection("quiz_jobs")
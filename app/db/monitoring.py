@@ -0,0 +1,192 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, Tuple
+from pymongo import monitoring
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Commands slower than this are logged with their (redacted) filter shape
+MONGO_SLOW_QUERY_MS = settings.get_float("MONGO_SLOW_QUERY_MS", 100)
+
+# Where each command keeps the filter it runs
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def redact(value: Any) -> Any:
+    """
+    Keep the shape of a filter (field names and operators) but drop the values
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value[:1]] if value else []
+    return "?"
+
+
+def filter_shape(command_name: str, command: dict) -> Any:
+    if command_name in FILTER_FIELDS:
+        return redact(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        return redact(statements[0].get("q", {}))
+    if command_name == "aggregate":
+        return [redact(stage) for stage in command.get("pipeline", [])]
+    return None
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """
+    Records command latency by collection and command, and logs slow ones.
+
+    Listener callbacks run on pymongo's threads, so updates are locked.
+    """
+
+    def __init__(self, slow_query_ms: float = MONGO_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[Any, int], Tuple[str, Any]] = {}
+        self._stats: Dict[Tuple[str, str], dict] = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.database_name
+        shape = filter_shape(event.command_name, command)
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (collection, shape)
+
+    def _finished(self, event, failed: bool):
+        with self._lock:
+            collection, shape = self._started.pop((event.connection_id, event.request_id), (None, None))
+            if collection is None:
+                return
+            duration_ms = event.duration_micros / 1000
+            stats = self._stats.setdefault((collection, event.command_name), {
+                "count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0,
+            })
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            if failed:
+                stats["failures"] += 1
+            slow = duration_ms >= self.slow_query_ms
+            if slow:
+                stats["slow"] += 1
+        if slow:
+            logger.warning(f"Slow MongoDB {event.command_name} on {collection}: "
+                           f"{duration_ms:.1f} ms, filter {shape}")
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def stats(self) -> Dict[str, Dict[str, dict]]:
+        with self._lock:
+            report: Dict[str, Dict[str, dict]] = {}
+            for (collection, command_name), stats in sorted(self._stats.items()):
+                report.setdefault(collection, {})[command_name] = {
+                    **stats,
+                    "avg_ms": stats["total_ms"] / stats["count"] if stats["count"] else 0.0,
+                }
+            return report
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection pool usage per server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, dict] = {}
+        self._checkout_started: Dict[str, list] = {}
+
+    def _pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        return self._pools.setdefault(key, {
+            "open": 0, "in_use": 0, "max_in_use": 0, "created": 0, "closed": 0,
+            "checked_out": 0, "checkout_failures": 0, "checkout_wait_ms_max": 0.0,
+        })
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["created"] += 1
+            pool["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["closed"] += 1
+            pool["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._checkout_started.setdefault(f"{event.address[0]}:{event.address[1]}", []).append(time.monotonic())
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._pool(event.address)["checkout_failures"] += 1
+            self._pop_checkout_start(event.address)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] += 1
+            pool["in_use"] += 1
+            pool["max_in_use"] = max(pool["max_in_use"], pool["in_use"])
+            started = self._pop_checkout_start(event.address)
+            if started is not None:
+                wait_ms = (time.monotonic() - started) * 1000
+                pool["checkout_wait_ms_max"] = max(pool["checkout_wait_ms_max"], wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address)["in_use"] -= 1
+
+    def _pop_checkout_start(self, address):
+        starts = self._checkout_started.get(f"{address[0]}:{address[1]}")
+        return starts.pop(0) if starts else None
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {address: dict(pool) for address, pool in self._pools.items()}
+
+
+# Shared across reconnects so that stats cover the life of the process
+command_stats_listener = CommandStatsListener()
+pool_stats_listener = PoolStatsListener()
+
+
+def mongo_stats() -> dict:
+    return {
+        "slow_query_ms": command_stats_listener.slow_query_ms,
+        "commands": command_stats_listener.stats(),
+        "pools": pool_stats_listener.stats(),
+    }
@@ -0,0 +1,222 @@
+"""
+Re-embed user preferences and destinations with the current embedding model.
+
+Streams documents whose vectors aren't stamped with the current
+EMBEDDING_MODEL / EMBEDDING_VERSION in _id order, embeds them in
+multi-input batches at a bounded request rate and writes them back with
+bulk_write. Progress is checkpointed in the jobs collection after every
+batch, so an interrupted run resumes where it stopped.
+
+Usage:
+    python -m app.jobs.reembed --target all --batch-size 64 --requests-per-minute 60
+    python -m app.jobs.reembed --status
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from app.db import mongodb
+from app.db.mongodb import get_destinations_collection, get_users_collection, get_jobs_collection
+from app.services.embeddings import (
+    EMBEDDING_MODEL, EMBEDDING_VERSION, EMBEDDING_DIMENSIONS,
+    can_reduce, embedding_stamp, reduce_embedding, stale_embedding_filter
+)
+from app.services.openai_service import OpenAIService
+from app.services.destination_catalogue import bump_catalogue_version
+from app.services.resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Vector field, source text field and extra filter per target collection
+TARGETS = {
+    "destinations": {
+        "collection": get_destinations_collection,
+        "field": "embedding",
+        "text": "profile",
+        "filter": {},
+        "projection": {"_id": 1, "profile": 1, "city": 1, "country": 1,
+                       "embedding": 1, "embedding_model": 1, "embedding_version": 1},
+    },
+    "users": {
+        "collection": get_users_collection,
+        "field": "preferences",
+        "text": "preferences_summary",
+        # Users who never took the quiz have nothing to re-embed
+        "filter": {"preferences.0": {"$exists": True}},
+        "projection": {"_id": 1, "preferences_summary": 1,
+                       "preferences": 1, "preferences_model": 1, "preferences_version": 1},
+    },
+}
+
+
+def checkpoint_id(target: str) -> str:
+    return f"reembed:{target}:{EMBEDDING_MODEL}:{EMBEDDING_VERSION}:{EMBEDDING_DIMENSIONS or 'full'}"
+
+
+async def source_texts(target: str, batch: List[dict]) -> List[Optional[str]]:
+    """
+    Text each document's vector is built from. Destinations embedded before
+    profiles were stored get a new profile; users without a stored summary
+    can't be re-embedded until they retake the quiz.
+    """
+    text_field = TARGETS[target]["text"]
+    texts = []
+    for document in batch:
+        text = document.get(text_field)
+        if not text and target == "destinations":
+            text = await OpenAIService.generate_destination_profile(document["city"], document["country"])
+            if text is None:
+                raise RuntimeError(f"Could not generate a profile for {document['city']}")
+            document[text_field] = text
+        texts.append(text or None)
+    return texts
+
+
+async def embed_with_retries(texts: List[str], bucket: TokenBucket, max_retries: int) -> List[List[float]]:
+    for attempt in range(max_retries + 1):
+        await bucket.acquire(max_wait=float("inf"))
+        embeddings = await OpenAIService.generate_embeddings(texts)
+        if embeddings is not None and len(embeddings) == len(texts):
+            return embeddings
+        if attempt < max_retries:
+            delay = 2 ** attempt
+            logger.warning(f"Embedding batch failed, retrying in {delay} s")
+            await asyncio.sleep(delay)
+    raise RuntimeError("Embedding batch failed, giving up")
+
+
+async def process_batch(target: str, batch: List[dict], bucket: TokenBucket, max_retries: int) -> dict:
+    config = TARGETS[target]
+    field = config["field"]
+    operations = []
+
+    # Longer vectors from the current model are shortened locally, without
+    # an API call
+    reducible = [document for document in batch if can_reduce(document, field)]
+    for document in reducible:
+        operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {
+            field: reduce_embedding(document[field]),
+            **embedding_stamp(field),
+        }}))
+    batch = [document for document in batch if not can_reduce(document, field)]
+
+    texts = await source_texts(target, batch)
+    todo = [(document, text) for document, text in zip(batch, texts) if text]
+    if todo:
+        embeddings = await embed_with_retries([text for _, text in todo], bucket, max_retries)
+        for (document, text), embedding in zip(todo, embeddings):
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {
+                field: embedding,
+                config["text"]: text,
+                **embedding_stamp(field),
+            }}))
+    if operations:
+        await config["collection"]().bulk_write(operations, ordered=False)
+
+    return {"processed": len(operations), "skipped": len(batch) - len(todo)}
+
+
+async def run(target: str, batch_size: int, requests_per_minute: float, max_retries: int, restart: bool) -> dict:
+    config = TARGETS[target]
+    collection = config["collection"]()
+    jobs = get_jobs_collection()
+    job_id = checkpoint_id(target)
+
+    if restart:
+        await jobs.delete_one({"_id": job_id})
+    checkpoint = await jobs.find_one({"_id": job_id}) or {}
+    if checkpoint.get("status") == "completed":
+        logger.info(f"{job_id} already completed, use --restart to run it again")
+        return checkpoint
+    if checkpoint.get("last_id") is not None:
+        logger.info(f"Resuming {job_id} after _id {checkpoint['last_id']}")
+
+    bucket = TokenBucket(requests_per_minute / 60, 1)
+    last_id = checkpoint.get("last_id")
+    while True:
+        query = {**config["filter"], **stale_embedding_filter(config["field"])}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, config["projection"]).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        counts = await process_batch(target, batch, bucket, max_retries)
+        last_id = batch[-1]["_id"]
+        checkpoint = await jobs.find_one_and_update(
+            {"_id": job_id},
+            {"$set": {"last_id": last_id, "status": "running", "updated_at": datetime.utcnow()},
+             "$inc": counts},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        logger.info(f"{target}: {checkpoint.get('processed', 0)} re-embedded, "
+                    f"{checkpoint.get('skipped', 0)} skipped")
+
+    checkpoint = await jobs.find_one_and_update(
+        {"_id": job_id},
+        {"$set": {"status": "completed", "updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if target == "destinations":
+        # Let every worker rebuild its index from the new vectors
+        await bump_catalogue_version()
+    return checkpoint
+
+
+async def embedding_status() -> dict:
+    """
+    Count documents per embedding stamp, to spot mixed states
+    """
+    report = {}
+    for target, config in TARGETS.items():
+        field = config["field"]
+        groups = await config["collection"]().aggregate([
+            {"$match": {field: {"$nin": [None, []]}}},
+            {"$group": {
+                "_id": {"model": f"${field}_model", "version": f"${field}_version",
+                        "dimensions": {"$size": f"${field}"}},
+                "count": {"$sum": 1},
+            }},
+        ]).to_list(length=None)
+        report[target] = {
+            f"{group['_id'].get('model') or 'unstamped'}:{group['_id'].get('version') or '-'}"
+            f":{group['_id']['dimensions']}d": group["count"]
+            for group in groups
+        }
+    return report
+
+
+async def main(args) -> int:
+    await mongodb.connect_to_mongo()
+    try:
+        if args.status:
+            print(f"Current: {EMBEDDING_MODEL}:{EMBEDDING_VERSION}:{EMBEDDING_DIMENSIONS or 'full'}")
+            for target, stamps in (await embedding_status()).items():
+                print(f"{target}: {stamps}")
+            return 0
+
+        targets = list(TARGETS) if args.target == "all" else [args.target]
+        for target in targets:
+            await run(target, args.batch_size, args.requests_per_minute, args.max_retries, args.restart)
+        return 0
+    except RuntimeError as e:
+        logger.error(f"Re-embedding stopped: {str(e)}. Run again to resume from the last checkpoint.")
+        return 1
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", choices=["all", *TARGETS], default="all")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--requests-per-minute", type=float, default=60)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--status", action="store_true", help="Only report embedding stamps")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,75 @@
+"""
+Recompute the progress counters stored on plan documents.
+
+member_count, quiz_completed_count, voted_count and total_likes are kept
+up to date by the join, quiz and vote writes, and plans created before
+they existed are backfilled at startup. Plans edited by hand can drift;
+this job finds plans whose counters don't match their members and
+suggestions and rewrites them.
+Each plan is fixed by one update computed on the server from the plan
+itself, so concurrent joins and votes are never overwritten.
+
+Usage:
+    python -m app.jobs.repair_plan_counters --dry-run
+    python -m app.jobs.repair_plan_counters
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from app.db import mongodb
+from app.db.mongodb import get_plans_collection
+from app.services.plan_counters import COUNTERS, DRIFTED
+
+logger = logging.getLogger(__name__)
+
+
+async def find_drifted(limit: int) -> list:
+    """
+    Plans with drifted counters, with their stored and computed values
+    """
+    pipeline = [
+        {"$match": DRIFTED},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "code": 1,
+            "stored": {field: f"${field}" for field in COUNTERS},
+            "computed": COUNTERS,
+        }},
+    ]
+    return await get_plans_collection().aggregate(pipeline).to_list(length=limit)
+
+
+async def repair() -> int:
+    """
+    Rewrite the counters of every drifted plan
+
+    Returns:
+        The number of plans repaired
+    """
+    result = await get_plans_collection().update_many(DRIFTED, [{"$set": COUNTERS}])
+    return result.modified_count
+
+
+async def main(args) -> int:
+    await mongodb.connect_to_mongo()
+    try:
+        drifted = await find_drifted(args.show)
+        for plan in drifted:
+            print(f"{plan['code']}: stored {plan['stored']}, computed {plan['computed']}")
+        if args.dry_run:
+            print(f"{len(drifted)} plans with drifted counters shown (at most {args.show})")
+            return 0
+        repaired = await repair()
+        logger.info(f"Repaired the counters of {repaired} plans")
+        return 0
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Only list plans with drifted counters")
+    parser.add_argument("--show", type=int, default=20, help="How many drifted plans to list")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -27,4 +27,14 @@ class UserLogin(BaseModel):
                 "password": "password123"
             }
         }
-    } 
\ No newline at end of file
+    }
+
+class AuthUser(BaseModel):
+    name: str
+    email: EmailStr
+    id: Optional[str] = None
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str
+    user: AuthUser
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
-from app.db.mongodb import get_destinations_collection, connect_to_mongo
-from app.data.destinations import destinations
+from typing import Dict, List, Optional, Union
+from app.db.mongodb import get_destinations_collection
+from app.services.destination_catalogue import bump_catalogue_version
 
 class Destination(BaseModel):
     city: str
@@ -37,15 +37,15 @@ class DestinationSuggestion(BaseModel):
     image: Optional[str] = None
     price: Optional[Union[float, None]] = None
     likes: int = 0
+    member_prices: Optional[Dict[str, Optional[float]]] = None
+    group_price_total: Optional[float] = None
+    group_price_max: Optional[float] = None
     
     model_config = {
         "populate_by_name": True
     }
 
 async def seed_destinations():
-    # Connect to MongoDB
-    await connect_to_mongo()
-    
     # Get destinations collection
     destinations_collection = get_destinations_collection()
     
@@ -55,9 +55,8 @@ async def seed_destinations():
         print(f"Destinations collection already has {count} documents. Skipping seed.")
         return
 
-    await destinations_collection.insert_many(destinations)
-    
-    
-    # Insert destinations
+    # Insert destinations; the seed list is only loaded when needed
+    from app.data.destinations import destinations
     result = await destinations_collection.insert_many(destinations)
-    print(f"Added {len(result.inserted_ids)} destinations")
\ No newline at end of file
+    print(f"Added {len(result.inserted_ids)} destinations")
+    await bump_catalogue_version()
\ No newline at end of file
@@ -23,6 +23,7 @@ class Plan(BaseModel):
     users: List[PlanUser] = []
     creator: PlanUser
     suggested_destinations: List[DestinationSuggestion] = []
+    version: int = 0
 
     model_config = {
         "populate_by_name": True,
@@ -39,6 +40,20 @@ class Plan(BaseModel):
         }
     }
 
+class PlanResponse(Plan):
+    id: str
+
+class PlanStatus(BaseModel):
+    """
+    Progress of a plan, from the counters kept on the plan document
+    """
+    code: str
+    member_count: int = 0
+    quiz_completed_count: int = 0
+    voted_count: int = 0
+    total_likes: int = 0
+    version: int = 0
+
 class PlanCreate(BaseModel):
     name: str
     startDate: str
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
+from datetime import datetime
 
 class User(BaseModel):
     name: str
@@ -14,6 +15,17 @@ class User(BaseModel):
     }
 
 
+class Principal(BaseModel):
+    """
+    The user behind an authenticated request, without the password and
+    preference vector
+    """
+    id: Optional[str] = None
+    name: str
+    email: EmailStr
+    location: str = ""
+
+
 
 class UserPreferences(BaseModel):
     question: str
@@ -21,4 +33,18 @@ class UserPreferences(BaseModel):
 
 class UserPreferencesRequest(BaseModel):
     preferences: List[UserPreferences]
-    location: str
\ No newline at end of file
+    location: str
+
+class QuizJobResult(BaseModel):
+    summary: str
+    top_destinations: List[str]
+
+class QuizJobResponse(BaseModel):
+    job_id: str
+    code: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[QuizJobResult] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,104 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from app.services.auth import require_admin
+from app.services.resilience import dependency_stats
+from app.services.single_flight import single_flight_stats
+from app.services.admission import admission_stats
+from app.services.price_prefetcher import prefetch_stats
+from app.services.local_cache import local_cache_stats
+from app.services.invalidation import invalidation_stats
+from app.services.profiler import PROFILING_DIR, list_profiles
+from app.db.monitoring import mongo_stats
+from app.services.destination_catalogue import get_catalogue, reload_catalogue, bump_catalogue_version
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/dependencies")
+async def get_dependency_stats():
+    """
+    Rate limiter and circuit breaker state for each external API
+    """
+    return dependency_stats()
+
+@router.get("/single-flight")
+async def get_single_flight_stats():
+    """
+    Issued and coalesced call counts for each single-flight group
+    """
+    return single_flight_stats()
+
+@router.get("/admission")
+async def get_admission_stats():
+    """
+    Active, queued, admitted and shed requests for each admission-controlled route
+    """
+    return admission_stats()
+
+@router.get("/price-prefetch")
+async def get_price_prefetch_stats():
+    """
+    Configuration and last cycle of the flight price prefetcher
+    """
+    return prefetch_stats()
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Size and hit rate of this worker's document caches, and the state of
+    the invalidation bus evicting them
+    """
+    return {"invalidation": invalidation_stats(), "caches": local_cache_stats()}
+
+@router.get("/catalogue")
+async def get_catalogue_info():
+    """
+    Version and size of this worker's destination catalogue
+    """
+    catalogue = get_catalogue()
+    return {
+        "version": catalogue.version,
+        "destinations": len(catalogue),
+        "embeddings": len(catalogue.index),
+        "index": catalogue.index.kind,
+    }
+
+@router.post("/catalogue/reload")
+async def reload_destination_catalogue():
+    """
+    Reload the destination catalogue from MongoDB
+
+    Bumps the catalogue version so that other workers reload on their next
+    version check, then reloads this worker immediately.
+    """
+    await bump_catalogue_version()
+    await reload_catalogue(force=True)
+    return await get_catalogue_info()
+
+@router.get("/db")
+async def get_db_stats():
+    """
+    MongoDB command latency by collection and command, and connection pool usage
+    """
+    return mongo_stats()
+
+@router.get("/profiles")
+async def get_profiles():
+    """
+    Stored request profiles, newest first
+    """
+    return list_profiles()
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str):
+    """
+    Download a request profile named in an X-Profile-Path header
+    """
+    if name not in list_profiles():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(os.path.join(PROFILING_DIR, name))
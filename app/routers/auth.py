@@ -1,32 +1,26 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Security, Request
-from app.models.auth import UserRegistration, UserLogin
-from app.models.user import User
+from app.models.auth import UserRegistration, UserLogin, TokenResponse
+from app.models.user import User, Principal
 from typing import Dict, Optional
 from datetime import datetime, timedelta
-from jose import jwt, JWTError
-import os
-from dotenv import load_dotenv
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
 from app.db.mongodb import get_users_collection
+from app.services.passwords import hash_password, verify_password, verify_dummy_password
 from bson import ObjectId
-import json
+from app.services.auth import SECRET_KEY, ALGORITHM, get_current_user_from_token
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Set up JWT configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-development")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Security
 security = HTTPBearer()
 
+# Fields login needs to check the password, without the preference vector
+LOGIN_PROJECTION = {"name": 1, "email": 1, "password": 1, "location": 1}
+
 router = APIRouter(
     prefix="/auth",
     tags=["auth"],
@@ -52,6 +46,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -59,36 +54,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
     """
     Dependency to get the current user from the JWT token
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-            
-    except JWTError as e:
-        raise credentials_exception
-    
-    # Find the user by email in MongoDB
-    users_collection = get_users_collection()
-    user_doc = await users_collection.find_one({"email": email})
-    
-    if not user_doc:
-        raise credentials_exception
-    
-    # Convert MongoDB document to User model
-    user = user_doc_to_model(user_doc)
-    
+    # Same projected, cached lookup as the other routers
+    user = await get_current_user_from_token(credentials.credentials)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     return user
 
-@router.post("/register", status_code=status.HTTP_201_CREATED, response_model=Dict)
+@router.post("/register", status_code=status.HTTP_201_CREATED, response_model=TokenResponse, response_model_exclude_none=True)
 async def register(user_data: UserRegistration):
     """
     Register a new user
@@ -99,7 +76,7 @@ async def register(user_data: UserRegistration):
     users_collection = get_users_collection()
     
     # Check if email already exists
-    existing_user = await users_collection.find_one({"email": user_data.email})
+    existing_user = await users_collection.find_one({"email": user_data.email}, {"_id": 1})
     if existing_user:
         logger.warning(f"Email already registered: {user_data.email}")
         raise HTTPException(
@@ -111,14 +88,14 @@ async def register(user_data: UserRegistration):
     user = User(
         name=user_data.name,
         email=user_data.email,
-        password=user_data.password,  # In production, should hash password
+        password=await hash_password(user_data.password),
         interests=[],
         location="",
         preferences=[]
     )
     
     # Insert user into MongoDB
-    user_dict = json.loads(user.model_dump_json())
+    user_dict = user.model_dump(mode="json")
     result = await users_collection.insert_one(user_dict)
     
     # Generate token for the newly registered user
@@ -139,7 +116,7 @@ async def register(user_data: UserRegistration):
         "user": user_response
     }
 
-@router.post("/login", response_model=Dict)
+@router.post("/login", response_model=TokenResponse, response_model_exclude_none=True)
 async def login(login_data: UserLogin):
     """
     Authenticate a user and return a token
@@ -150,8 +127,9 @@ async def login(login_data: UserLogin):
     users_collection = get_users_collection()
     
     # Find user by email
-    user_doc = await users_collection.find_one({"email": login_data.email})
+    user_doc = await users_collection.find_one({"email": login_data.email}, LOGIN_PROJECTION)
     if not user_doc:
+        await verify_dummy_password(login_data.password)
         logger.warning(f"User not found: {login_data.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -162,8 +140,9 @@ async def login(login_data: UserLogin):
     # Convert to User model
     user = user_doc_to_model(user_doc)
     
-    # Check password (should use password hashing in production)
-    if user.password != login_data.password:
+    # Check password on the hashing pool
+    valid, needs_rehash = await verify_password(login_data.password, user.password)
+    if not valid:
         logger.warning(f"Incorrect password for user: {login_data.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -171,6 +150,14 @@ async def login(login_data: UserLogin):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade plain-text or outdated hashes now that we know the password
+    if needs_rehash:
+        logger.info(f"Rehashing password for: {user.email}")
+        await users_collection.update_one(
+            {"email": user.email},
+            {"$set": {"password": await hash_password(login_data.password)}}
+        )
+    
     logger.info(f"Login successful for: {user.email}")
     
     # Generate a JWT token with an expiration time
@@ -188,7 +175,7 @@ async def login(login_data: UserLogin):
     }
 
 @router.get("/me", response_model=Dict)
-async def get_user_info(current_user: User = Depends(get_current_user)):
+async def get_user_info(current_user: Principal = Depends(get_current_user)):
     """
     Get current authenticated user information
     """
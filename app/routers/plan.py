@@ -1,19 +1,22 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Request
-from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 import uuid
-from app.models.plan import Plan, PlanCreate, PlanUser
+from app.models.plan import Plan, PlanCreate, PlanUser, PlanResponse, PlanStatus
 from app.services.auth import get_current_user_from_request, get_user_or_raise_401
-from app.db.mongodb import get_plans_collection, get_destinations_collection
+from app.db.mongodb import get_plans_collection, get_users_collection
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import logging
-import json
 from app.services.pexels_service import PexelsService
-from app.data.destinations import destinations
-from app.services.amadeus_service import AmadeusService
+from app.services.flight_price_service import FlightPriceService
 from app.models.destination import DestinationSuggestion
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+from app.services.admission import admit
+from app.services.price_prefetcher import PRICE_PREFETCH_ENABLED
+from app.services.tracing import hash_plan_code, set_span_attributes
+from app.services.local_cache import LocalCache
+from app.services.plan_counters import compute_plan_status, has_counters, plan_status_cache
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -22,6 +25,33 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Worker-local cache, evicted by the invalidation bus when any worker
+# writes the document
+destination_cache = LocalCache("destinations", "destinations", "airport_code", projection={"embedding": 0})
+
+# Plan codes are 24 random bits, so a code can collide with an existing
+# plan's; the unique index rejects it and another code is tried
+PLAN_CODE_ATTEMPTS = 5
+
+# The podium only needs the suggestions and the version for its ETag
+PODIUM_PROJECTION = {"suggested_destinations": 1, "version": 1}
+
+def generate_plan_code() -> str:
+    return str(uuid.uuid4())[:6].upper()
+
+def join_filter(code: str, email: str) -> dict:
+    """
+    The plan while the user is not a member yet
+    """
+    return {"code": code, "users.email": {"$ne": email}}
+
+def first_vote_filter(code: str, airport_code: str, email: str) -> dict:
+    """
+    The plan while it suggests the destination and the user hasn't voted yet
+    """
+    return {"code": code, "suggested_destinations.airport_code": airport_code,
+            "users": {"$elemMatch": {"email": email, "has_voted": {"$ne": True}}}}
+
 # Helper function to convert MongoDB plan document to Plan model
 def plan_doc_to_model(plan_doc):
     if not plan_doc:
@@ -41,7 +71,27 @@ def plan_doc_to_model(plan_doc):
     
     return Plan(**plan_doc)
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+def plan_etag(version: int) -> str:
+    return f'"{version}"'
+
+def etag_matches(request: Request, version: int) -> bool:
+    """
+    Check the request's If-None-Match header against a plan version
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etag = plan_etag(version)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def not_modified(version: int) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": plan_etag(version)})
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=PlanResponse)
 async def create_plan(plan_data: PlanCreate, request: Request):
     """
     Create a new travel plan
@@ -56,7 +106,7 @@ async def create_plan(plan_data: PlanCreate, request: Request):
         )
     
     # Generate a unique code for the plan
-    code = str(uuid.uuid4())[:6].upper()
+    code = generate_plan_code()
     
     # Parse the date strings (format: YYYY-MM-DD)
     try:
@@ -83,15 +133,32 @@ async def create_plan(plan_data: PlanCreate, request: Request):
         endDate=end_date,
         code=code,
         users=[plan_user],
-        creator=plan_user
+        creator=plan_user,
+        version=1
     )
     
     # Convert plan to dict for MongoDB
-    plan_dict = json.loads(plan.model_dump_json())
+    plan_dict = plan.model_dump(mode="json")
+    # Used by the price prefetcher to prioritise recently active plans
+    plan_dict["last_activity_at"] = datetime.utcnow()
+    # Progress counters served by /plan/{code}/status
+    plan_dict.update(member_count=1, quiz_completed_count=0, voted_count=0, total_likes=0)
     
     # Store in MongoDB
     plans_collection = get_plans_collection()
-    result = await plans_collection.insert_one(plan_dict)
+    for attempt in range(PLAN_CODE_ATTEMPTS):
+        try:
+            result = await plans_collection.insert_one(plan_dict)
+            break
+        except DuplicateKeyError:
+            logger.warning(f"Plan code {plan_dict['code']} already taken, generating another")
+            plan_dict.pop("_id", None)
+            plan_dict["code"] = generate_plan_code()
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not generate a unique plan code, please retry"
+        )
     
     # Add the MongoDB id to the plan
     plan_dict["id"] = str(result.inserted_id)
@@ -102,7 +169,7 @@ async def create_plan(plan_data: PlanCreate, request: Request):
     return plan_dict
     
 
-@router.get("/", response_model=List)
+@router.get("/", response_model=List[PlanResponse])
 async def get_all_plans(request: Request):
     """
     Get all plans for the current user
@@ -127,83 +194,138 @@ async def get_all_plans(request: Request):
     
     return plans
 
-@router.get("/{code}")
-async def get_plan(code: str, request: Request):
+@router.get("/{code}", response_model=PlanResponse)
+async def get_plan(code: str, request: Request, response: Response):
     """
     Get a plan by code
+
+    Supports conditional requests: answers 304 when If-None-Match carries
+    the current plan version and the caller is already a member.
     """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
     user = await get_user_or_raise_401(request)
 
-    # Find plan in MongoDB
     plans_collection = get_plans_collection()
+
+    # Cheap version-only lookup for conditional requests
+    if request.headers.get("If-None-Match"):
+        version_doc = await plans_collection.find_one(
+            {"code": code},
+            {"_id": 0, "version": 1, "users": {"$elemMatch": {"email": user.email}}}
+        )
+        if version_doc and version_doc.get("users") and etag_matches(request, version_doc.get("version", 0)):
+            return not_modified(version_doc.get("version", 0))
+
+    # Find plan in MongoDB
     plan_doc = await plans_collection.find_one({"code": code})
     
     if not plan_doc:
         raise HTTPException(status_code=404, detail="Plan not found")
 
+    # Members only read; anyone else joins the plan
     if user.email not in [user["email"] for user in plan_doc["users"]]:
         plan_user = PlanUser(
             name=user.name,
             email=user.email,
             is_quiz_completed=False
         )
-        plan_user_dict = json.loads(plan_user.model_dump_json())
-        plan_doc["users"].append(plan_user_dict)
-        await plans_collection.update_one(
-            {"code": code},
-            {"$set": {"users": plan_doc["users"]}}
+        # Push only while the user is still absent, so concurrent joins
+        # (other invitees, or the same user in two tabs) can't overwrite
+        # or duplicate each other
+        joined_doc = await plans_collection.find_one_and_update(
+            join_filter(code, user.email),
+            {"$push": {"users": plan_user.model_dump()},
+             "$set": {"last_activity_at": datetime.utcnow()},
+             "$inc": {"version": 1, "member_count": 1}},
+            return_document=ReturnDocument.AFTER
         )
+        plan_status_cache.invalidate(code)
+        # None means a concurrent request joined first
+        plan_doc = joined_doc or await plans_collection.find_one({"code": code})
 
     # Convert to dict for response
     plan_doc["id"] = str(plan_doc["_id"])
     del plan_doc["_id"]
     
+    response.headers["ETag"] = plan_etag(plan_doc.get("version", 0))
     return plan_doc
 
 
+@router.get("/{code}/status", response_model=PlanStatus)
+async def get_plan_status(code: str, request: Request):
+    """
+    Get how many members have completed the quiz and voted
+
+    Served from the plan's counters through a covered query on the plan
+    status index, without loading the plan document, and cached in the
+    worker until the plan changes.
+    """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
+    await get_user_or_raise_401(request)
+
+    status_doc = await plan_status_cache.get_or_load(code)
+    if status_doc and not has_counters(status_doc):
+        # Created before the counters existed and not backfilled yet
+        status_doc = await compute_plan_status(code)
+    if not status_doc:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return status_doc
+
+
 @router.post("/{code}/vote/{airport_code}")
 async def vote_destination(code: str, airport_code: str, request: Request):
     """
     Vote for a destination
     """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
     logger.info(f"Voting for destination {airport_code} in plan {code}")
     user = await get_current_user_from_request(request)
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     plans_collection = get_plans_collection()
-    plan = await plans_collection.find_one({"code": code})
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    
-    # Find the destination in the plan
-    destination = next((d for d in plan["suggested_destinations"] if d["airport_code"] == airport_code), None)
-    if not destination:
-        raise HTTPException(status_code=404, detail="Destination not found")
-    
-    # Update the destination with the new vote
-    destination["likes"] += 1
 
-    
-    # Update the plan with the new destination
-    await plans_collection.update_one(
-        {"code": code},
-        {
-            "$set": {
-                "suggested_destinations": plan["suggested_destinations"],
-                "users.$[user].has_voted": True
-            }
+    # One atomic increment of the destination's likes, so concurrent votes
+    # are all counted
+    update = {
+        "$set": {
+            "users.$[user].has_voted": True,
+            "last_activity_at": datetime.utcnow()
         },
-        array_filters=[{"user.email": user.email}]
+        "$inc": {"suggested_destinations.$[destination].likes": 1, "total_likes": 1, "version": 1}
+    }
+    array_filters = [{"user.email": user.email}, {"destination.airport_code": airport_code}]
+
+    # The voted counter only moves on the user's first vote
+    result = await plans_collection.update_one(
+        first_vote_filter(code, airport_code, user.email),
+        {**update, "$inc": {**update["$inc"], "voted_count": 1}},
+        array_filters=array_filters
     )
+    if not result.matched_count:
+        result = await plans_collection.update_one(
+            {"code": code, "suggested_destinations.airport_code": airport_code},
+            update,
+            array_filters=array_filters
+        )
+    plan_status_cache.invalidate(code)
+    if not result.matched_count:
+        if not await plans_collection.find_one({"code": code}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Plan not found")
+        raise HTTPException(status_code=404, detail="Destination not found")
 
     return
 
-@router.get("/{code}/suggestions")
-async def get_plan_suggestions(code: str, request: Request):
+@router.get("/{code}/suggestions", response_model=List[DestinationSuggestion],
+            dependencies=[Depends(admit("suggestions"))])
+async def get_plan_suggestions(code: str, request: Request, pricing: Literal["user", "group"] = "user"):
     """
     Get suggestions for a plan
+
+    With pricing=group every suggestion carries the per-member prices from
+    each member's home airport, plus the group total and maximum.
     """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
     plans_collection = get_plans_collection()
     plan = await plans_collection.find_one({"code": code})
     plan_data = plan_doc_to_model(plan)
@@ -213,69 +335,107 @@ async def get_plan_suggestions(code: str, request: Request):
     
     # Check if the plan already has suggestions
     if len(plan_data.suggested_destinations) > 0:
-        return await get_suggestions_with_prices(plan_data, request)
+        return await get_suggestions_with_prices(plan_data, request, pricing)
     else:
-        return await generate_new_suggestions(plan_data, code, request)
+        return await generate_new_suggestions(plan_data, code, request, pricing)
 
-async def get_suggestions_with_prices(plan_data, request):
+def suggestion_doc(destination_doc: dict) -> dict:
+    """
+    Build the stored form of a DestinationSuggestion from a destination document
+    """
+    photo_url = destination_doc.get("photo_url")
+    return {
+        "country": destination_doc.get("country", ""),
+        "city": destination_doc.get("city", ""),
+        "airport_code": destination_doc.get("airport_code", ""),
+        "description": destination_doc.get("description", ""),
+        "photo_url": photo_url,
+        "image": photo_url,
+        "price": None,
+        "likes": destination_doc.get("likes", 0),
+    }
+
+def suggestion_response(suggestion: dict, price) -> dict:
+    """
+    Build a suggestion response dict with a live price (not stored in DB)
+    """
+    response = dict(suggestion)
+    # Handle missing image field (might be referenced as photo_url in some places)
+    if not response.get("image"):
+        response["image"] = response.get("photo_url") or None
+    # Make sure price is a float or explicitly None
+    response["price"] = float(price) if price is not None else None
+    return response
+
+async def get_member_locations(plan_data) -> Dict[str, Optional[str]]:
+    """
+    Get the stored home airport of every plan member
+    """
+    emails = [u.email for u in plan_data.users]
+    cursor = get_users_collection().find({"email": {"$in": emails}}, {"_id": 0, "email": 1, "location": 1})
+    locations = {user_doc["email"]: user_doc.get("location") or None async for user_doc in cursor}
+    return {email: locations.get(email) for email in emails}
+
+async def price_suggestions(plan_data, suggestions: List[dict], user, pricing: str, refresh_stale: bool = True) -> List[dict]:
+    """
+    Add live prices to suggestion dicts (not stored in DB)
+
+    In "user" mode the price is for the whole group flying from the
+    requesting user's location. In "group" mode an origin x destination
+    matrix is priced over every member's location, one adult each.
+    With refresh_stale=False stale stored prices are served as they are.
+    """
+    outbound_date = plan_data.startDate.strftime("%Y-%m-%d")
+    inbound_date = plan_data.endDate.strftime("%Y-%m-%d")
+
+    if pricing == "group":
+        members = await get_member_locations(plan_data)
+        origins = {location for location in members.values() if location}
+        routes = [
+            (origin, suggestion["airport_code"], outbound_date, inbound_date, 1)
+            for origin in origins for suggestion in suggestions
+        ]
+        prices = await FlightPriceService.get_route_prices(routes, refresh_stale=refresh_stale)
+
+        response = []
+        for suggestion in suggestions:
+            member_prices = {
+                email: prices.get((location, suggestion["airport_code"], outbound_date, inbound_date, 1)) if location else None
+                for email, location in members.items()
+            }
+            known_prices = [price for price in member_prices.values() if price is not None]
+            suggestion_dict = suggestion_response(suggestion, member_prices.get(user.email) if user else None)
+            suggestion_dict["member_prices"] = member_prices
+            suggestion_dict["group_price_total"] = sum(known_prices) if known_prices else None
+            suggestion_dict["group_price_max"] = max(known_prices) if known_prices else None
+            response.append(suggestion_dict)
+        return response
+
+    # Only fetch prices if we have user location
+    if not (user and user.location):
+        return [suggestion_response(suggestion, None) for suggestion in suggestions]
+
+    participants = len(plan_data.users)
+    routes = [
+        (user.location, suggestion["airport_code"], outbound_date, inbound_date, participants)
+        for suggestion in suggestions
+    ]
+    prices = await FlightPriceService.get_route_prices(routes, refresh_stale=refresh_stale)
+    return [suggestion_response(suggestion, prices.get(route)) for suggestion, route in zip(suggestions, routes)]
+
+async def get_suggestions_with_prices(plan_data, request, pricing="user"):
     """
     Get existing suggestions and add prices locally (not stored in DB)
     """
-    logger.info(f"Getting existing suggestions with live prices")
+    logger.info(f"Getting existing suggestions with live prices ({pricing} pricing)")
     user = await get_current_user_from_request(request)
     
-    suggestions_with_prices = []
-    
-    for destination in plan_data.suggested_destinations:
-        # Create a copy of the destination
-        destination_dict = destination.model_dump()
-        
-        # Handle missing image field (might be referenced as photo_url in some places)
-        if "image" not in destination_dict or destination_dict["image"] is None:
-            if "photo_url" in destination_dict and destination_dict["photo_url"]:
-                destination_dict["image"] = destination_dict["photo_url"]
-            else:
-                destination_dict["image"] = None
-        
-        # Only fetch price if we have user location
-        if user and user.location:
-            try:
-                price = await AmadeusService.get_cheapest_quotes(
-                    origin=user.location,
-                    destination=destination.airport_code,
-                    outbound_date=plan_data.startDate.strftime("%Y-%m-%d"),
-                    inbound_date=plan_data.endDate.strftime("%Y-%m-%d"),
-                    participants=len(plan_data.users),
-                )
-                # Make sure price is a float or explicitly None
-                destination_dict["price"] = float(price) if price is not None else None
-            except Exception as e:
-                logger.error(f"Error getting price for {destination.airport_code}: {str(e)}")
-                destination_dict["price"] = None
-        else:
-            destination_dict["price"] = None
-            
-        # Create a validated object with all fields properly handled
-        try:
-            validated_suggestion = DestinationSuggestion(**destination_dict)
-            suggestions_with_prices.append(validated_suggestion)
-        except Exception as e:
-            logger.error(f"Validation error for destination {destination.airport_code}: {str(e)}")
-            # Include a minimal valid suggestion if validation fails
-            fallback_suggestion = DestinationSuggestion(
-                name=destination_dict.get("name", "Unknown"),
-                country=destination_dict.get("country", ""),
-                city=destination_dict.get("city", ""),
-                airport_code=destination_dict.get("airport_code", ""),
-                description=destination_dict.get("description", ""),
-                price=None,
-                image=None
-            )
-            suggestions_with_prices.append(fallback_suggestion)
-    
-    return suggestions_with_prices
-
-async def generate_new_suggestions(plan_data, code, request):
+    suggestions = [destination.model_dump() for destination in plan_data.suggested_destinations]
+    # Prices of active plans are kept fresh by the prefetcher; routes it
+    # hasn't reached yet are still fetched
+    return await price_suggestions(plan_data, suggestions, user, pricing, refresh_stale=not PRICE_PREFETCH_ENABLED)
+
+async def generate_new_suggestions(plan_data, code, request, pricing="user"):
     """
     Generate new suggestions for a plan (without storing prices in DB)
     """
@@ -295,20 +455,17 @@ async def generate_new_suggestions(plan_data, code, request):
         # You could add fallback logic here for when there are no common destinations
         return []
     
-    destinations_intersection = []
-    destinations_collection = get_destinations_collection()
+    destination_suggestions_for_db = []
     
     for destination in suggestions:
         try:
-            destination_doc = await destinations_collection.find_one({"airport_code": destination}, {"embedding": 0})
+            destination_doc = await destination_cache.get_or_load(destination)
             if not destination_doc:
                 logger.warning(f"Destination not found: {destination}")
                 continue
-                
-            destination_doc["id"] = str(destination_doc["_id"])
-            del destination_doc["_id"]
             
             # Get destination image if not already available
+            set_span_attributes({"photo.cache_hit": bool(destination_doc.get("photo_url"))})
             if not destination_doc.get("photo_url"):
                 try:
                     photo_url = await PexelsService.get_destination_photo(
@@ -320,76 +477,51 @@ async def generate_new_suggestions(plan_data, code, request):
                     logger.error(f"Error getting photo for {destination}: {str(e)}")
                     destination_doc["photo_url"] = None
                     
-            destinations_intersection.append(destination_doc)
+            destination_suggestions_for_db.append(suggestion_doc(destination_doc))
         except Exception as e:
             logger.error(f"Error processing destination {destination}: {str(e)}")
     
-    # Create suggestion objects (without prices) to store in DB
-    destination_suggestions_for_db = []
-    for destination_doc in destinations_intersection:
-        try:
-            suggestion = DestinationSuggestion(
-                country=destination_doc.get("country", ""),
-                city=destination_doc.get("city", ""),
-                airport_code=destination_doc.get("airport_code", ""),
-                description=destination_doc.get("description", ""),
-                photo_url=destination_doc.get("photo_url"),
-                image=destination_doc.get("photo_url"),
-                likes=destination_doc.get("likes", 0)
-            )
-            destination_suggestions_for_db.append(suggestion)
-        except Exception as e:
-            logger.error(f"Error creating suggestion: {str(e)}")
-    
     # Update plan with new suggestions (no prices stored)
     plans_collection = get_plans_collection()
     await plans_collection.update_one(
         {"code": code},
-        {"$set": {"suggested_destinations": [dest.model_dump() for dest in destination_suggestions_for_db]}}
+        {"$set": {
+            "suggested_destinations": destination_suggestions_for_db,
+            "total_likes": sum(suggestion["likes"] for suggestion in destination_suggestions_for_db),
+            "last_activity_at": datetime.utcnow()
+        }, "$inc": {"version": 1}}
     )
+    plan_status_cache.invalidate(code)
     
     # Now add prices for the response (not stored in DB)
-    destination_suggestions_with_prices = []
-    
-    if user and user.location:
-        for suggestion in destination_suggestions_for_db:
-            suggestion_dict = suggestion.model_dump()
-            try:
-                price = await AmadeusService.get_cheapest_quotes(
-                    origin=user.location,
-                    destination=suggestion.airport_code,
-                    outbound_date=plan_data.startDate.strftime("%Y-%m-%d"),
-                    inbound_date=plan_data.endDate.strftime("%Y-%m-%d"),
-                    participants=len(plan_data.users),
-                )
-                # Make sure price is a float or explicitly None
-                suggestion_dict["price"] = float(price) if price is not None else None
-            except Exception as e:
-                logger.error(f"Error getting price for {suggestion.airport_code}: {str(e)}")
-                suggestion_dict["price"] = None
-                
-            destination_suggestions_with_prices.append(DestinationSuggestion(**suggestion_dict))
-    else:
-        # If no user location, just add None for prices
-        for suggestion in destination_suggestions_for_db:
-            suggestion_dict = suggestion.model_dump()
-            suggestion_dict["price"] = None
-            destination_suggestions_with_prices.append(DestinationSuggestion(**suggestion_dict))
-    
-    return destination_suggestions_with_prices
+    return await price_suggestions(plan_data, destination_suggestions_for_db, user, pricing)
 
 
-@router.get("/{code}/podium")
-async def finalize_plan(code: str, request: Request):
+@router.get("/{code}/podium", response_model=List[DestinationSuggestion])
+async def finalize_plan(code: str, request: Request, response: Response):
     """
     Finalize the plan
+
+    Supports conditional requests: answers 304 when If-None-Match carries
+    the current plan version.
     """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
     plans_collection = get_plans_collection()
-    plan_doc = await plans_collection.find_one({"code": code})
+
+    # Cheap version-only lookup for conditional requests
+    if request.headers.get("If-None-Match"):
+        version_doc = await plans_collection.find_one({"code": code}, {"_id": 0, "version": 1})
+        if version_doc and etag_matches(request, version_doc.get("version", 0)):
+            return not_modified(version_doc.get("version", 0))
+
+    plan_doc = await plans_collection.find_one({"code": code}, PODIUM_PROJECTION)
+    if not plan_doc:
+        raise HTTPException(status_code=404, detail="Plan not found")
     
     # Get the top 3 destinations
     top_destinations = sorted(plan_doc["suggested_destinations"], key=lambda x: x["likes"], reverse=True)[:3]
     
+    response.headers["ETag"] = plan_etag(plan_doc.get("version", 0))
     return top_destinations
     
     
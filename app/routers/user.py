@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, status, Request, Response, Depends
+from fastapi.responses import StreamingResponse
 from typing import List
-from app.models.user import User, UserPreferences, UserPreferencesRequest
-from app.services.openai_service import OpenAIService
-from app.services.auth import get_current_user_from_request
+from app.models.user import User, UserPreferences, UserPreferencesRequest, QuizJobResponse
+from app.services.auth import get_user_or_raise_401
 from pydantic import BaseModel
-from app.db.mongodb import get_users_collection, get_plans_collection
-import numpy as np
-from app.data.destinations import destinations
+from app.db.mongodb import get_plans_collection
+from app.services.quiz_jobs import enqueue_quiz_job, get_quiz_job
+from app.services.quiz_processing import QuizProcessingError, stream_quiz
+from app.services.destination_catalogue import get_catalogue
+from app.services.readiness import require_ready
+from app.services.admission import admit
+from app.services.tracing import hash_plan_code, set_span_attributes
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,76 +23,88 @@ router = APIRouter(
 )
 
 
-def cosine_similarity(vec1, vec2):
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
-    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+@router.post("/{code}/preferences", status_code=status.HTTP_202_ACCEPTED, response_model=QuizJobResponse)
+async def addUserPreferences(code: str, user_preferences_request: UserPreferencesRequest, request: Request, response: Response):
+    """
+    Queue the quiz answers for processing
 
+    Summarising, embedding and ranking run on the quiz workers; poll
+    GET /user/jobs/{job_id} for the result. Resubmitting the same answers
+    returns the same job.
+    """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
+    user = await get_user_or_raise_401(request)
 
-@router.post("/{code}/preferences")
-async def addUserPreferences(code: str, user_preferences_request: UserPreferencesRequest, request: Request):
-    user = await get_current_user_from_request(request) 
+    plan = await get_plans_collection().find_one({"code": code, "users.email": user.email}, {"_id": 1})
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
 
-    preferences = user_preferences_request.preferences
-
-    openai_service = OpenAIService()
-    preferences_prompt = ""
-    for preference in preferences:
-        preferences_prompt += f"Question: '{preference.question}' Answer: '{preference.answer}'\n"
-
-    user_summary = await openai_service.generate_user_summary(preferences_prompt)
-
-    if user_summary is None:
-        raise HTTPException(status_code=500, detail="Failed to generate user summary")
-
-    user_embedding = await openai_service.generate_embedding(user_summary)
-
-    # Get users collection from MongoDB
-    users_collection = get_users_collection()
-
-    logger.info(f"Updating user preferences for {user.email}")
-    
-    # Update user preferences in database
-    result = await users_collection.update_one(
-        {"email": user.email},
-        {"$set": {
-            "location": user_preferences_request.location,
-            "preferences": user_embedding
-        }}
+    job = await enqueue_quiz_job(
+        user.email, code,
+        [preference.model_dump() for preference in user_preferences_request.preferences],
+        user_preferences_request.location
     )
-
-    plans_collection = get_plans_collection()
-    result = await plans_collection.update_one(
-        {"users.email": user.email, "code": code},
-        {"$set": {
-            "users.$.is_quiz_completed": True
-        }}
+    response.headers["Location"] = f"/user/jobs/{job['job_id']}"
+    return job
+
+
+def sse_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: ".encode() + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/{code}/preferences/stream", dependencies=[Depends(require_ready("catalogue")), Depends(admit("preferences"))])
+async def stream_user_preferences(code: str, user_preferences_request: UserPreferencesRequest, request: Request):
+    """
+    Process the quiz answers while streaming the result as server-sent events
+
+    Sends "summary" events with the travel profile text as it is generated,
+    then a "destinations" event with the ranked destinations, and "error"
+    if a step fails.
+    """
+    set_span_attributes({"plan.code_hash": hash_plan_code(code)})
+    user = await get_user_or_raise_401(request)
+
+    plan = await get_plans_collection().find_one({"code": code, "users.email": user.email}, {"_id": 1})
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    preferences = [preference.model_dump() for preference in user_preferences_request.preferences]
+
+    async def events():
+        try:
+            async for event, data in stream_quiz(user.email, code, preferences, user_preferences_request.location):
+                if event == "summary":
+                    yield sse_event("summary", {"delta": data})
+                else:
+                    catalogue = get_catalogue()
+                    yield sse_event("destinations", {"top_destinations": [
+                        {"airport_code": airport_code, "city": catalogue.get(airport_code)["city"]}
+                        if catalogue.get(airport_code) else {"airport_code": airport_code}
+                        for airport_code in data
+                    ]})
+        except QuizProcessingError as e:
+            yield sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            # Headers are already sent, so report it in the stream
+            logger.error(f"Error streaming preferences for {user.email}: {str(e)}")
+            yield sse_event("error", {"detail": "Failed to process preferences"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    if user_embedding is None:
-       raise HTTPException(status_code=500, detail="Failed to generate user embedding")
-
-    destinations_similarities = []
-    
-    for destination in destinations:
-        destination_embedding = destination['embedding']
-        similarity = cosine_similarity(user_embedding, destination_embedding)
-        destinations_similarities.append((destination, similarity))
-
-    sorted_destinations = sorted(destinations_similarities, key=lambda x: x[1], reverse=True)
-
-    cities = []
-    for destination in sorted_destinations[:25]:
-        cities.append(destination[0]['city'])
-
-    valid_cities = await openai_service.check_is_valid_destination(user_summary, cities)
-
-    valid_destinations = []
-    for destination in sorted_destinations[:25]:
-        if destination[0]['city'] in valid_cities:
-            valid_destinations.append(destination)
-    
-    plans_collection.update_one({"users.email": user.email, "code": code}, 
-    {"$set": {"users.$.top_destinations": [destination[0]['airport_code'] for destination in valid_destinations]}})
 
-    return user_summary
+@router.get("/jobs/{job_id}", response_model=QuizJobResponse)
+async def get_quiz_job_status(job_id: str, request: Request):
+    """
+    Status of a quiz processing job, with the summary and top destinations
+    once it has succeeded
+    """
+    user = await get_user_or_raise_401(request)
+    job = await get_quiz_job(job_id, user.email)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
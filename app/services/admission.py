@@ -0,0 +1,157 @@
+import time
+import asyncio
+import logging
+from typing import Dict
+from fastapi import HTTPException, status
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Retry-After sent with shed requests
+ADMISSION_RETRY_AFTER_SECONDS = settings.get_int("ADMISSION_RETRY_AFTER_SECONDS", 2)
+
+# Requests running at once, requests allowed to wait for a slot, and how
+# long they may wait, per expensive route. The quiz makes three LLM calls;
+# suggestions can fan out to 20+ flight and photo lookups.
+ADMISSION_LIMITS = {
+    "preferences": (
+        settings.get_int("PREFERENCES_MAX_CONCURRENCY", 8),
+        settings.get_int("PREFERENCES_MAX_QUEUE", 16),
+        settings.get_float("PREFERENCES_QUEUE_TIMEOUT", 2),
+    ),
+    "suggestions": (
+        settings.get_int("SUGGESTIONS_MAX_CONCURRENCY", 16),
+        settings.get_int("SUGGESTIONS_MAX_QUEUE", 32),
+        settings.get_float("SUGGESTIONS_QUEUE_TIMEOUT", 1),
+    ),
+}
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a short bounded wait queue.
+
+    Requests beyond max_concurrency wait for a slot, but only up to
+    max_queue of them and only for queue_timeout seconds; the rest are shed
+    straight away so that a burst can't pile up coroutines that drag down
+    the cheap endpoints.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._waiters = []
+
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.max_queued = 0
+        self.total_wait_ms = 0.0
+
+    def _shed(self, reason: str) -> HTTPException:
+        logger.warning(f"Shedding {self.name} request: {reason}")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again shortly",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+
+    async def acquire(self) -> None:
+        """
+        Take a slot, waiting in the queue if needed. Raises a 503 when the
+        queue is full or the wait deadline passes.
+        """
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if self.queued >= self.max_queue:
+            self.shed_queue_full += 1
+            raise self._shed("queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Unless the slot was handed over just as the deadline passed
+            if not waiter.done():
+                waiter.cancel()
+                self.shed_timeout += 1
+                raise self._shed("queue wait deadline exceeded")
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot we may have been handed
+            if waiter.done():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            self.queued -= 1
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        self.admitted += 1
+        self.admitted_after_wait += 1
+        self.total_wait_ms += (time.monotonic() - start) * 1000
+
+    def release(self) -> None:
+        """
+        Free a slot, handing it straight to the oldest waiter if any
+        """
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                # The slot moves to the waiter, so active stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "admitted_after_wait": self.admitted_after_wait,
+            "avg_wait_ms": self.total_wait_ms / self.admitted_after_wait if self.admitted_after_wait else 0.0,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+limiters: Dict[str, AdmissionLimiter] = {
+    name: AdmissionLimiter(name, *limits) for name, limits in ADMISSION_LIMITS.items()
+}
+
+
+def admission_stats() -> Dict[str, dict]:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def admit(name: str):
+    """
+    Dependency factory that holds one of the route's admission slots for
+    the duration of the request
+    """
+    limiter = limiters[name]
+
+    async def admission_slot():
+        await limiter.acquire()
+        try:
+            yield
+        finally:
+            limiter.release()
+    return admission_slot
@@ -1,20 +1,23 @@
-import os
-import aiohttp
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Optional
 from datetime import datetime
-from dotenv import load_dotenv
+from app.services.resilience import get_dependency, is_failure_status
+from app.services.single_flight import get_single_flight
+from app.services.tracing import traced
+from app.config import settings
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Get API key from environment variable
-AMADEUS_API_KEY = os.getenv("AMADEUS_API_KEY")
-AMADEUS_API_SECRET = os.getenv("AMADEUS_API_SECRET")
+AMADEUS_API_KEY = settings.get("AMADEUS_API_KEY")
+AMADEUS_API_SECRET = settings.get("AMADEUS_API_SECRET")
+AMADEUS_TIMEOUT_SECONDS = settings.get_float("AMADEUS_TIMEOUT_SECONDS", 10)
+
+
+class AmadeusUnavailable(Exception):
+    """
+    The Amadeus call was rejected (circuit open, rate limited) or failed
+    """
 
 class AmadeusService:
     """
@@ -23,23 +26,35 @@ class AmadeusService:
     """
 
     @staticmethod
+    @traced("amadeus.get_token")
     async def get_token() -> str:
         """
         Get a new token for the Amadeus API.
         
+        Concurrent callers share a single in-flight token request.
+        
         Args:
             None
             
         Returns:
             str: New token for the Amadeus API
         """
+        return await get_single_flight("amadeus.token").do("token", AmadeusService._get_token)
+
+    @staticmethod
+    async def _get_token() -> str:
         if not AMADEUS_API_KEY or not AMADEUS_API_SECRET:
             logger.error("Amadeus API key or secret not set. Unable to get token.")
             return None
             
+        amadeus = get_dependency("amadeus")
+        if not await amadeus.acquire():
+            return None
         
+        # aiohttp is imported on first use to keep startup fast
+        import aiohttp
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=AMADEUS_TIMEOUT_SECONDS)) as session:
                 async with session.post(
                     "https://test.api.amadeus.com/v1/security/oauth2/token",
                     headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -50,41 +65,82 @@ class AmadeusService:
                     }
                 ) as response:
                     if response.status == 200:
+                        amadeus.record_success()
                         data = await response.json()
                         return data.get("access_token")
                     else:
+                        if is_failure_status(response.status):
+                            amadeus.record_failure()
+                        else:
+                            amadeus.record_success()
                         logger.error(f"Amadeus login API error: {response.status}")
                         return None
         except Exception as e:
+            amadeus.record_failure()
             logger.error(f"Error getting token: {str(e)}")
             return None
     
     @staticmethod
+    @traced("amadeus.get_cheapest_quotes", lambda args: {
+        "flight.origin": args.get("origin"),
+        "destination.code": args.get("destination"),
+        "flight.adults": args.get("participants"),
+    })
     async def get_cheapest_quotes(
         origin: str,
         destination: str,
         outbound_date: str,
         inbound_date: str,
         participants: int
-    ) -> List[Dict[str, Any]]:
+    ) -> Optional[str]:
         """
         Get the cheapest quotes for a route.
         
+        Identical concurrent requests share a single in-flight Amadeus call.
+        
         Args:
             origin (str): Origin place (IATA code)
             destination (str): Destination place (IATA code)
+            
+        Returns:
+            Optional[str]: Total price of the cheapest offer, or None if
+            Amadeus has no offers for the route
+            
+        Raises:
+            AmadeusUnavailable: If the call was rejected or failed
         """
+        return await get_single_flight("amadeus.quotes").do(
+            (origin, destination, outbound_date, inbound_date, participants),
+            AmadeusService._get_cheapest_quotes,
+            origin, destination, outbound_date, inbound_date, participants
+        )
+
+    @staticmethod
+    async def _get_cheapest_quotes(
+        origin: str,
+        destination: str,
+        outbound_date: str,
+        inbound_date: str,
+        participants: int
+    ) -> Optional[str]:
         logger.info(f"Getting cheapest quotes for {origin} to {destination} on {outbound_date} to {inbound_date} for {participants} participants")
         if not AMADEUS_API_KEY or not AMADEUS_API_SECRET:
-            logger.error("Amadeus API key or secret not set. Unable to get token.")
-            return None
+            raise AmadeusUnavailable("Amadeus API key or secret not set")
             
+        token = await AmadeusService.get_token()
+        if token is None:
+            raise AmadeusUnavailable("No Amadeus token")
+
+        amadeus = get_dependency("amadeus")
+        if not await amadeus.acquire():
+            raise AmadeusUnavailable("Amadeus circuit open or rate limited")
         
+        import aiohttp
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=AMADEUS_TIMEOUT_SECONDS)) as session:
                 async with session.get(
                     "https://test.api.amadeus.com/v2/shopping/flight-offers",
-                    headers={"Authorization": f"Bearer {await AmadeusService.get_token()}"},
+                    headers={"Authorization": f"Bearer {token}"},
                     params={
                         "originLocationCode": origin,
                         "destinationLocationCode": destination,
@@ -96,13 +152,23 @@ class AmadeusService:
                     }
                 ) as response:
                     if response.status == 200:
+                        amadeus.record_success()
                         data = await response.json()
-                        price = data.get("data", [])[0].get("price", {}).get("total", 0)
+                        offers = data.get("data", [])
+                        if not offers:
+                            logger.info(f"No flight offers for {origin} to {destination}")
+                            return None
+                        price = offers[0].get("price", {}).get("total", 0)
                         return price
                     else:
-                        logger.error(f"Amadeus quotes API error: {response.status}")
-                        return None
+                        if is_failure_status(response.status):
+                            amadeus.record_failure()
+                        else:
+                            amadeus.record_success()
+                        raise AmadeusUnavailable(f"Amadeus quotes API error: {response.status}")
+        except AmadeusUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Error getting quotes: {str(e)}")
-            return None
+            amadeus.record_failure()
+            raise AmadeusUnavailable(f"Error getting quotes: {str(e)}") from e
         
\ No newline at end of file
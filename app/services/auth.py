@@ -1,25 +1,29 @@
 from typing import Optional
 from fastapi import HTTPException, status, Request
-from jose import jwt, JWTError
-import os
-from dotenv import load_dotenv
-from app.models.user import User
+import hmac
+from app.models.user import Principal
 import logging
-from app.db.mongodb import get_users_collection
+from app.services.local_cache import LocalCache
+from app.config import settings
 
-# Setup basic logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # JWT configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-development")
+SECRET_KEY = settings.get("SECRET_KEY", "your-secret-key-for-development")
 ALGORITHM = "HS256"
 
-# Helper function to convert MongoDB user document to User model
-def user_doc_to_model(user_doc):
+# Token required by the /admin endpoints. Unset disables them.
+ADMIN_TOKEN = settings.get("ADMIN_TOKEN")
+
+# Fields of the user document authenticated requests need. The password
+# and preference vector are only read by login and the quiz.
+PRINCIPAL_PROJECTION = {"name": 1, "email": 1, "location": 1}
+
+# Users behind authenticated requests, evicted by the invalidation bus
+user_cache = LocalCache("users", "users", "email", projection=PRINCIPAL_PROJECTION)
+
+# Helper function to convert a projected MongoDB user document to a Principal
+def user_doc_to_principal(user_doc):
     if not user_doc:
         return None
     
@@ -28,9 +32,9 @@ def user_doc_to_model(user_doc):
         user_doc["id"] = str(user_doc["_id"])
         del user_doc["_id"]
     
-    return User(**user_doc)
+    return Principal(**user_doc)
 
-async def get_current_user_from_token(token: str) -> Optional[User]:
+async def get_current_user_from_token(token: str) -> Optional[Principal]:
     """
     Internal method to get the current user from a token
     
@@ -38,10 +42,12 @@ async def get_current_user_from_token(token: str) -> Optional[User]:
         token: JWT token string
         
     Returns:
-        User object if token is valid and user exists, None otherwise
+        Principal if token is valid and user exists, None otherwise
     """
     logger.info(f"Processing token: {token[:10]}...")
     
+    # jose is imported on first use to keep startup fast
+    from jose import jwt, JWTError
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         logger.info(f"Token decoded, payload: {payload}")
@@ -57,21 +63,20 @@ async def get_current_user_from_token(token: str) -> Optional[User]:
         logger.error(f"JWT Error: {str(e)}")
         return None
     
-    # Find the user by email in MongoDB
-    users_collection = get_users_collection()
-    user_doc = await users_collection.find_one({"email": email})
+    # Find the user by email, in this worker's cache or MongoDB
+    user_doc = await user_cache.get_or_load(email)
     
     if not user_doc:
         logger.error(f"No user found with email: {email}")
         return None
     
-    # Convert MongoDB document to User model
-    user = user_doc_to_model(user_doc)
+    # Convert MongoDB document to Principal
+    user = user_doc_to_principal(user_doc)
     logger.info(f"User found: {user.name}")
     
     return user
 
-async def get_current_user_from_request(request: Request) -> Optional[User]:
+async def get_current_user_from_request(request: Request) -> Optional[Principal]:
     """
     Get the current user from the request's Authorization header
     
@@ -79,7 +84,7 @@ async def get_current_user_from_request(request: Request) -> Optional[User]:
         request: FastAPI Request object
         
     Returns:
-        User object if authenticated, None otherwise
+        Principal if authenticated, None otherwise
     """
     logger.info("Processing request for authentication")
     
@@ -97,7 +102,7 @@ async def get_current_user_from_request(request: Request) -> Optional[User]:
     
     return await get_current_user_from_token(token)
 
-async def get_user_or_raise_401(request: Request) -> User:
+async def get_user_or_raise_401(request: Request) -> Principal:
     """
     Get the current user or raise a 401 Unauthorized exception
     
@@ -105,7 +110,7 @@ async def get_user_or_raise_401(request: Request) -> User:
         request: FastAPI Request object
         
     Returns:
-        User object if authenticated
+        Principal if authenticated
         
     Raises:
         HTTPException: 401 Unauthorized if user is not authenticated
@@ -118,4 +123,26 @@ async def get_user_or_raise_401(request: Request) -> User:
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user 
\ No newline at end of file
+    return user
+
+def require_admin(request: Request) -> None:
+    """
+    Dependency that only lets requests carrying the admin token through
+    
+    Args:
+        request: FastAPI Request object
+        
+    Raises:
+        HTTPException: 403 Forbidden if the admin API is disabled or the token is wrong
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API disabled"
+        )
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        logger.warning("Rejected admin request with invalid token")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
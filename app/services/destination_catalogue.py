@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from app.db.mongodb import get_destinations_collection, get_catalogue_meta_collection
+from app.services.embeddings import can_reduce, has_foreign_stamp, reduce_embedding
+from app.config import settings
+
+if TYPE_CHECKING:
+    # numpy is only imported once the catalogue is first used
+    from app.services.destination_index import DestinationIndex
+
+logger = logging.getLogger(__name__)
+
+# How often each worker checks the catalogue version. 0 disables polling.
+CATALOGUE_POLL_SECONDS = settings.get_float("CATALOGUE_POLL_SECONDS", 60)
+
+CATALOGUE_META_ID = "destinations"
+
+
+class DestinationCatalogue:
+    """
+    Immutable snapshot of the destination catalogue and its similarity index.
+
+    Request handlers take a reference with get_catalogue() and use it for
+    the whole request; reloads build a new snapshot and swap the reference,
+    so a request never sees a half-built index.
+    """
+
+    def __init__(self, version: int, destinations: List[dict], index: "DestinationIndex"):
+        self.version = version
+        self.by_code: Dict[str, dict] = {}
+        for destination in destinations:
+            self.by_code.setdefault(destination["airport_code"], destination)
+        self.destinations = list(self.by_code.values())
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.destinations)
+
+    def get(self, airport_code: str) -> Optional[dict]:
+        return self.by_code.get(airport_code)
+
+    def search(self, embedding, k: int) -> List[Tuple[dict, float]]:
+        """
+        Return the k destinations most similar to an embedding, best first.
+        """
+        if self.index.dim and len(embedding) != self.index.dim:
+            if len(embedding) < self.index.dim:
+                logger.warning(f"Query embedding has {len(embedding)} dimensions, "
+                               f"index has {self.index.dim}")
+                return []
+            embedding = reduce_embedding(embedding, self.index.dim)
+        return [
+            (self.by_code[airport_code], similarity)
+            for airport_code, similarity in self.index.search(embedding, k)
+            if airport_code in self.by_code
+        ]
+
+
+_catalogue: Optional[DestinationCatalogue] = None
+_reload_lock = asyncio.Lock()
+
+
+def get_catalogue() -> DestinationCatalogue:
+    global _catalogue
+    if _catalogue is None:
+        from app.services.destination_index import create_destination_index
+        _catalogue = DestinationCatalogue(0, [], create_destination_index())
+    return _catalogue
+
+
+async def get_catalogue_version() -> int:
+    meta = await get_catalogue_meta_collection().find_one({"_id": CATALOGUE_META_ID})
+    return meta.get("version", 0) if meta else 0
+
+
+async def bump_catalogue_version() -> int:
+    """
+    Mark the catalogue as changed so that every worker reloads it.
+    """
+    meta = await get_catalogue_meta_collection().find_one_and_update(
+        {"_id": CATALOGUE_META_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    logger.info(f"Destination catalogue version bumped to {meta['version']}")
+    return meta["version"]
+
+
+def _build_catalogue(version: int, destinations: List[dict]) -> DestinationCatalogue:
+    from app.services.destination_index import build_destination_index
+    foreign = 0
+    for destination in destinations:
+        if not destination.get("embedding"):
+            continue
+        if can_reduce(destination, "embedding"):
+            # Full-size vectors from the current model are shortened to the
+            # configured EMBEDDING_DIMENSIONS
+            destination["embedding"] = reduce_embedding(destination["embedding"])
+        elif has_foreign_stamp(destination, "embedding"):
+            # Mid re-embedding some vectors come from another model; they
+            # can't be compared with query vectors
+            destination.pop("embedding")
+            foreign += 1
+    if foreign:
+        logger.warning(f"{foreign} destinations have embeddings from another model, "
+                       f"excluding them until app.jobs.reembed has run")
+    index = build_destination_index(destinations, version)
+    # The vectors live in the index; don't keep a second copy per destination
+    for destination in destinations:
+        destination.pop("embedding", None)
+    return DestinationCatalogue(version, destinations, index)
+
+
+async def reload_catalogue(force: bool = False) -> DestinationCatalogue:
+    """
+    Load the catalogue from MongoDB if its version changed (or if forced),
+    build the index off the event loop and atomically swap it in.
+    """
+    global _catalogue
+    async with _reload_lock:
+        version = await get_catalogue_version()
+        current = get_catalogue()
+        if not force and version == current.version and len(current):
+            return current
+
+        destinations = await get_destinations_collection().find({}, {"_id": 0, "profile": 0}).to_list(length=None)
+        catalogue = await asyncio.to_thread(_build_catalogue, version, destinations)
+        _catalogue = catalogue
+        logger.info(f"Loaded destination catalogue version {version}: "
+                    f"{len(catalogue)} destinations, {len(catalogue.index)} embeddings")
+        return catalogue
+
+
+async def watch_catalogue_version(interval: float = CATALOGUE_POLL_SECONDS) -> None:
+    """
+    Periodically reload the catalogue when its version changes.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload_catalogue()
+        except Exception as e:
+            logger.error(f"Error reloading destination catalogue: {str(e)}")
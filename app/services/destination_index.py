@@ -0,0 +1,318 @@
+import os
+import logging
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Index configuration
+DESTINATION_INDEX_TYPE = settings.get("DESTINATION_INDEX_TYPE", "ivf")
+DESTINATION_INDEX_PATH = settings.get("DESTINATION_INDEX_PATH")
+IVF_NPROBE = settings.get_int("IVF_NPROBE", 8)
+IVF_MIN_TRAIN_SIZE = settings.get_int("IVF_MIN_TRAIN_SIZE", 2048)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class DestinationIndex:
+    """
+    Base class for nearest-neighbour indexes over destination embeddings.
+
+    Vectors are stored L2-normalised so that inner product equals cosine
+    similarity. Keys are the destination airport codes.
+    """
+
+    kind = "base"
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self.version: Optional[int] = None
+        self.keys: List[str] = []
+        self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, keys: Sequence[str], vectors) -> None:
+        """
+        Insert new vectors. Keys that already exist are replaced.
+        """
+        if len(keys) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if len(keys) != len(vectors):
+            raise ValueError("keys and vectors must have the same length")
+        if self.dim is None or len(self.keys) == 0:
+            self.dim = vectors.shape[1]
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        vectors = _normalize(vectors)
+        positions = {key: i for i, key in enumerate(self.keys)}
+        new_keys, new_rows = [], []
+        for key, vector in zip(keys, vectors):
+            if key in positions:
+                self.vectors[positions[key]] = vector
+                self._on_replace(positions[key], vector)
+            else:
+                positions[key] = len(self.keys) + len(new_keys)
+                new_keys.append(key)
+                new_rows.append(vector)
+
+        if new_keys:
+            start = len(self.keys)
+            self.keys.extend(new_keys)
+            self.vectors = np.vstack([self.vectors, np.asarray(new_rows, dtype=np.float32)])
+            self._on_append(start, self.vectors[start:])
+
+    def search(self, query, k: int, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        Return the k most similar keys with their cosine similarity, best first.
+        """
+        if len(self.keys) == 0:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if exact:
+            return self._exact_search(query, k)
+        return self._search(query, k)
+
+    def _exact_search(self, query: np.ndarray, k: int,
+                      candidates: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        if candidates is None:
+            scores = self.vectors @ query
+            rows = np.arange(len(self.keys))
+        else:
+            scores = self.vectors[candidates] @ query
+            rows = candidates
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[rows[i]], float(scores[i])) for i in top]
+
+    def _search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        return self._exact_search(query, k)
+
+    def _on_append(self, start: int, vectors: np.ndarray) -> None:
+        pass
+
+    def _on_replace(self, position: int, vector: np.ndarray) -> None:
+        pass
+
+    def _extra_state(self) -> dict:
+        return {}
+
+    def _load_extra_state(self, state) -> None:
+        pass
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index to a local .npz file.
+        """
+        # Every worker may rebuild the index at once, so each writes its own
+        # temporary file and atomically replaces the index with it
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path),
+                                         suffix=".tmp.npz", delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+            try:
+                np.savez(
+                    tmp_file,
+                    kind=np.array(self.kind),
+                    version=np.array(-1 if self.version is None else self.version),
+                    keys=np.array(self.keys),
+                    vectors=self.vectors,
+                    **self._extra_state()
+                )
+            except BaseException:
+                tmp_file.close()
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {self.kind} destination index with {len(self)} vectors to {path}")
+
+    @staticmethod
+    def load(path: str) -> "DestinationIndex":
+        """
+        Load an index previously written with save().
+        """
+        with np.load(path, allow_pickle=False) as state:
+            kind = str(state["kind"])
+            index_class = INDEX_TYPES.get(kind)
+            if index_class is None:
+                raise ValueError(f"Unknown destination index type: {kind}")
+            index = index_class()
+            index.keys = [str(key) for key in state["keys"]]
+            index.vectors = state["vectors"].astype(np.float32)
+            index.dim = index.vectors.shape[1] if len(index.keys) else None
+            if "version" in state.files and int(state["version"]) >= 0:
+                index.version = int(state["version"])
+            index._load_extra_state(state)
+        logger.info(f"Loaded {kind} destination index with {len(index)} vectors from {path}")
+        return index
+
+
+class ExactIndex(DestinationIndex):
+    """
+    Brute-force index. Exact, and the fastest option for small catalogues.
+    """
+
+    kind = "exact"
+
+
+class IVFIndex(DestinationIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means
+    centroid and a query only scans the nprobe closest buckets.
+
+    Until the catalogue reaches min_train_size vectors the index is not
+    trained and every search falls back to the exact scan.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: Optional[int] = None, nlist: Optional[int] = None,
+                 nprobe: int = IVF_NPROBE, min_train_size: int = IVF_MIN_TRAIN_SIZE):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Run k-means over the stored vectors and rebuild the inverted lists.
+        """
+        n = len(self.keys)
+        if n == 0:
+            return
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = self.vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.argmax(self.vectors @ self.centroids.T, axis=1).astype(np.int32)
+        self._rebuild_lists()
+        logger.info(f"Trained IVF destination index: {n} vectors, {nlist} lists")
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+    def _on_append(self, start: int, vectors: np.ndarray) -> None:
+        if not self.is_trained:
+            if len(self.keys) >= self.min_train_size:
+                self.train()
+            return
+        new_assignments = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+        self.assignments = np.concatenate([self.assignments, new_assignments])
+        for offset, c in enumerate(new_assignments):
+            self._lists[c] = np.append(self._lists[c], start + offset)
+
+    def _on_replace(self, position: int, vector: np.ndarray) -> None:
+        if not self.is_trained:
+            return
+        old = self.assignments[position]
+        new = int(np.argmax(self.centroids @ vector))
+        if old != new:
+            self.assignments[position] = new
+            self._lists[old] = self._lists[old][self._lists[old] != position]
+            self._lists[new] = np.append(self._lists[new], position)
+
+    def _search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not self.is_trained or self.nprobe >= len(self.centroids):
+            return self._exact_search(query, k)
+        probes = np.argpartition(-(self.centroids @ query), self.nprobe - 1)[:self.nprobe]
+        candidates = np.concatenate([self._lists[c] for c in probes])
+        if len(candidates) < k:
+            return self._exact_search(query, k)
+        return self._exact_search(query, k, candidates)
+
+    def _extra_state(self) -> dict:
+        if not self.is_trained:
+            return {}
+        return {"centroids": self.centroids, "assignments": self.assignments}
+
+    def _load_extra_state(self, state) -> None:
+        if "centroids" in state.files:
+            self.centroids = state["centroids"].astype(np.float32)
+            self.assignments = state["assignments"].astype(np.int32)
+            self.nlist = len(self.centroids)
+            self._rebuild_lists()
+
+
+INDEX_TYPES = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_destination_index(kind: str = DESTINATION_INDEX_TYPE) -> DestinationIndex:
+    """
+    Create an empty index of the configured type.
+    """
+    index_class = INDEX_TYPES.get(kind)
+    if index_class is None:
+        logger.warning(f"Unknown destination index type '{kind}', using exact search")
+        index_class = ExactIndex
+    return index_class()
+
+
+def build_destination_index(destinations: List[dict], version: Optional[int] = None,
+                            path: Optional[str] = DESTINATION_INDEX_PATH) -> DestinationIndex:
+    """
+    Build an index from destination dicts carrying an 'embedding'.
+
+    When a path is configured and the persisted index was built from the
+    same catalogue version and covers exactly the same destinations, it is
+    loaded instead of rebuilt. The built index is written back to the path
+    for the next worker.
+    """
+    with_embeddings = {d["airport_code"]: d["embedding"] for d in destinations if d.get("embedding")}
+
+    if path and os.path.exists(path):
+        try:
+            index = DestinationIndex.load(path)
+            if (index.kind == DESTINATION_INDEX_TYPE and index.version == version
+                    and set(index.keys) == set(with_embeddings)):
+                return index
+            logger.info("Persisted destination index is stale, rebuilding")
+        except Exception as e:
+            logger.error(f"Error loading destination index from {path}: {str(e)}")
+
+    index = create_destination_index()
+    index.version = version
+    index.add(list(with_embeddings.keys()), list(with_embeddings.values()))
+
+    if path:
+        try:
+            index.save(path)
+        except Exception as e:
+            logger.error(f"Error saving destination index to {path}: {str(e)}")
+
+    return index
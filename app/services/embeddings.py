@@ -0,0 +1,72 @@
+import math
+from typing import List, Optional, Sequence
+from app.config import settings
+
+# Embedding model used for user preferences and destinations. Bump
+# EMBEDDING_VERSION whenever the vectors change without a model change
+# (e.g. a different profile prompt), then run app/jobs/reembed.py.
+EMBEDDING_MODEL = settings.get("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_VERSION = settings.get_int("EMBEDDING_VERSION", 1)
+# Shortened vector size requested from the API (text-embedding-3 models
+# support it). Unset keeps the model's full output.
+EMBEDDING_DIMENSIONS = settings.get_int("EMBEDDING_DIMENSIONS") or None
+
+
+def reduce_embedding(vector: Sequence[float], dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> List[float]:
+    """
+    Truncate a vector to its first dimensions components and re-normalise
+    it, which for text-embedding-3 models matches asking the API for that
+    size
+    """
+    if not dimensions or len(vector) <= dimensions:
+        return list(vector)
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def embedding_stamp(field: str) -> dict:
+    """
+    Fields recording which model produced the vector stored in field
+    """
+    return {
+        f"{field}_model": EMBEDDING_MODEL,
+        f"{field}_version": EMBEDDING_VERSION,
+        f"{field}_dimensions": EMBEDDING_DIMENSIONS,
+    }
+
+
+def stale_embedding_filter(field: str) -> dict:
+    """
+    Query matching documents whose vector in field is not from the current
+    model, version and size, including vectors stored before stamping existed
+    """
+    return {"$or": [
+        {f"{field}_model": {"$ne": EMBEDDING_MODEL}},
+        {f"{field}_version": {"$ne": EMBEDDING_VERSION}},
+        {f"{field}_dimensions": {"$ne": EMBEDDING_DIMENSIONS}},
+    ]}
+
+
+def has_foreign_stamp(document: dict, field: str) -> bool:
+    """
+    True when the document's vector is stamped with another model, version
+    or size. Unstamped vectors predate stamping and are assumed compatible.
+    """
+    model = document.get(f"{field}_model")
+    if model is None:
+        return False
+    stamp = (model, document.get(f"{field}_version"), document.get(f"{field}_dimensions"))
+    return stamp != (EMBEDDING_MODEL, EMBEDDING_VERSION, EMBEDDING_DIMENSIONS)
+
+
+def can_reduce(document: dict, field: str) -> bool:
+    """
+    True when the stored vector is a longer output of the current model and
+    version, so it can be shortened locally instead of re-embedded
+    """
+    vector = document.get(field) or []
+    return (EMBEDDING_DIMENSIONS is not None
+            and len(vector) > EMBEDDING_DIMENSIONS
+            and document.get(f"{field}_model", EMBEDDING_MODEL) == EMBEDDING_MODEL
+            and document.get(f"{field}_version", EMBEDDING_VERSION) == EMBEDDING_VERSION)
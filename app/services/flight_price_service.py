@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from app.db.mongodb import get_flight_prices_collection
+from app.services.amadeus_service import AmadeusService, AmadeusUnavailable
+from app.services.tracing import traced, set_span_attributes
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched price is reused before Amadeus is asked again
+PRICE_REFRESH_SECONDS = settings.get_int("PRICE_REFRESH_SECONDS", 3600)
+# Failed lookups are retried sooner than successful ones are refreshed
+PRICE_MISS_SECONDS = settings.get_int("PRICE_MISS_SECONDS", 300)
+# Maximum number of Amadeus requests in flight for one matrix
+PRICE_FETCH_CONCURRENCY = settings.get_int("PRICE_FETCH_CONCURRENCY", 4)
+
+# (origin, destination, outbound_date, inbound_date, adults)
+Route = Tuple[str, str, str, str, int]
+
+
+def route_id(route: Route) -> str:
+    origin, destination, outbound_date, inbound_date, adults = route
+    return f"{origin}:{destination}:{outbound_date}:{inbound_date}:{adults}"
+
+
+def routes_filter(routes: Iterable[Route]) -> dict:
+    return {"_id": {"$in": [route_id(route) for route in routes]}}
+
+
+class FlightPriceService:
+    """
+    Shared flight price store backed by the flight_prices collection.
+
+    Each route is fetched from Amadeus at most once per refresh window,
+    no matter how many plans or viewers ask for it.
+    """
+
+    @staticmethod
+    def is_fresh(price_doc: Optional[dict], now: Optional[datetime] = None) -> bool:
+        if not price_doc or not price_doc.get("fetched_at"):
+            return False
+        window = PRICE_REFRESH_SECONDS if price_doc.get("price") is not None else PRICE_MISS_SECONDS
+        return (now or datetime.utcnow()) - price_doc["fetched_at"] < timedelta(seconds=window)
+
+    @staticmethod
+    @traced("prices.fetch_route_price", lambda args: {
+        "flight.origin": args["route"][0],
+        "destination.code": args["route"][1],
+    })
+    async def fetch_route_price(route: Route) -> Optional[float]:
+        """
+        Fetch a route from Amadeus and write it to the store.
+
+        A route without offers is stored as a miss (price None). Rejected or
+        failed calls raise AmadeusUnavailable and leave the store untouched,
+        so a previously fetched price stays servable.
+        """
+        origin, destination, outbound_date, inbound_date, adults = route
+        price = await AmadeusService.get_cheapest_quotes(
+            origin=origin,
+            destination=destination,
+            outbound_date=outbound_date,
+            inbound_date=inbound_date,
+            participants=adults,
+        )
+        price = float(price) if price is not None else None
+
+        await get_flight_prices_collection().update_one(
+            {"_id": route_id(route)},
+            {"$set": {
+                "origin": origin,
+                "destination": destination,
+                "outbound_date": outbound_date,
+                "inbound_date": inbound_date,
+                "adults": adults,
+                "price": price,
+                "fetched_at": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+        return price
+
+    @staticmethod
+    async def refresh_routes(routes: Iterable[Route]) -> Dict[Route, Optional[float]]:
+        """
+        Fetch routes from Amadeus with bounded concurrency. Routes whose
+        fetch was rejected or failed are left out of the result.
+        """
+        routes = list(routes)
+        semaphore = asyncio.Semaphore(PRICE_FETCH_CONCURRENCY)
+        failed = object()
+
+        async def fetch(route):
+            async with semaphore:
+                try:
+                    return await FlightPriceService.fetch_route_price(route)
+                except AmadeusUnavailable as e:
+                    logger.warning(f"Price for {route_id(route)} not refreshed: {str(e)}")
+                except Exception as e:
+                    logger.error(f"Error getting price for {route_id(route)}: {str(e)}")
+                return failed
+
+        results = await asyncio.gather(*(fetch(route) for route in routes))
+        return {route: price for route, price in zip(routes, results) if price is not failed}
+
+    @staticmethod
+    async def get_stored_prices(routes: Iterable[Route]) -> Dict[str, dict]:
+        """
+        Stored price documents for the routes, by route id
+        """
+        cursor = get_flight_prices_collection().find(routes_filter(routes))
+        return {doc["_id"]: doc async for doc in cursor}
+
+    @staticmethod
+    @traced("prices.get_route_prices")
+    async def get_route_prices(routes: Iterable[Route], refresh_stale: bool = True) -> Dict[Route, Optional[float]]:
+        """
+        Get prices for a set of routes, fetching stale or missing ones with
+        bounded concurrency. Duplicate routes are fetched once.
+
+        With refresh_stale=False stale prices are returned as they are,
+        leaving their refresh to the price prefetcher; missing ones are
+        still fetched. When a refresh fails the stale price is returned.
+        """
+        routes = list(dict.fromkeys(routes))
+        if not routes:
+            return {}
+
+        stored = await FlightPriceService.get_stored_prices(routes)
+
+        now = datetime.utcnow()
+        prices = {}
+        stale = []
+        for route in routes:
+            price_doc = stored.get(route_id(route))
+            if FlightPriceService.is_fresh(price_doc, now) or (not refresh_stale and price_doc):
+                prices[route] = price_doc.get("price")
+            else:
+                stale.append(route)
+
+        set_span_attributes({
+            "cache.hits": len(routes) - len(stale),
+            "cache.misses": len(stale),
+            "prices.refresh_stale": refresh_stale,
+        })
+        if stale:
+            refreshed = await FlightPriceService.refresh_routes(stale)
+            for route in stale:
+                price_doc = stored.get(route_id(route)) or {}
+                prices[route] = refreshed.get(route, price_doc.get("price"))
+            logger.info(f"Fetched {len(stale)} of {len(routes)} routes from Amadeus")
+
+        return prices
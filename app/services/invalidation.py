@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+from pymongo.errors import OperationFailure
+from app.db import mongodb
+from app.services.local_cache import caches, all_caches
+from app.services.destination_catalogue import reload_catalogue
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# "auto" tails a change stream and falls back to polling on standalone
+# servers, which don't support change streams; "poll" always polls
+CACHE_INVALIDATION_MODE = settings.get("CACHE_INVALIDATION_MODE", "auto")
+# Delay between revalidation rounds in polling mode
+CACHE_POLL_SECONDS = settings.get_float("CACHE_POLL_SECONDS", 5)
+# Delay before reopening a change stream after an error
+CHANGE_STREAM_RETRY_SECONDS = settings.get_float("CHANGE_STREAM_RETRY_SECONDS", 2)
+
+# Collections whose changes evict cache entries
+WATCHED_COLLECTIONS = ("users", "plans", "destinations")
+# A new catalogue version is announced here and reloads the catalogue
+CATALOGUE_META_COLLECTION = "catalogue_meta"
+
+# "$changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# The resume token is older than the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+_resume_token: Optional[dict] = None
+_catalogue_reload: Optional[asyncio.Task] = None
+_stats = {
+    "mode": None,
+    "events": 0,
+    "last_event_at": None,
+    "reconnects": 0,
+    "history_lost": 0,
+    "poll_rounds": 0,
+    "poll_evictions": 0,
+}
+
+
+def change_stream_pipeline() -> list:
+    # Only the keys caches are looked up by are needed from each document
+    key_fields = {cache.key_field for cache in all_caches()}
+    return [
+        {"$match": {"ns.coll": {"$in": [*WATCHED_COLLECTIONS, CATALOGUE_META_COLLECTION]}}},
+        {"$project": {
+            "operationType": 1,
+            "ns": 1,
+            "documentKey": 1,
+            **{f"fullDocument.{field}": 1 for field in key_fields},
+        }},
+    ]
+
+
+async def _reload_catalogue() -> None:
+    try:
+        await reload_catalogue()
+    except Exception as e:
+        logger.error(f"Error reloading destination catalogue: {str(e)}")
+
+
+def _reload_catalogue_soon() -> None:
+    global _catalogue_reload
+    # A burst of version bumps needs a single reload
+    if _catalogue_reload is None or _catalogue_reload.done():
+        _catalogue_reload = asyncio.create_task(_reload_catalogue())
+
+
+def apply_change(change: dict) -> None:
+    """
+    Evict the cache entries of the document a change event is about
+    """
+    collection = change.get("ns", {}).get("coll")
+    _stats["events"] += 1
+    _stats["last_event_at"] = datetime.utcnow()
+
+    if collection == CATALOGUE_META_COLLECTION:
+        _reload_catalogue_soon()
+        return
+    if change["operationType"] not in ("insert", "update", "replace", "delete"):
+        # drop, rename or invalidate: the documents are gone wholesale
+        for cache in caches.get(collection, []) if collection else all_caches():
+            cache.clear()
+        return
+
+    doc_id = change["documentKey"]["_id"]
+    full_document = change.get("fullDocument") or {}
+    for cache in caches.get(collection, []):
+        cache.invalidate_document(doc_id, full_document.get(cache.key_field))
+
+
+async def tail_change_stream() -> None:
+    """
+    Apply change events until the stream fails. Raises OperationFailure
+    if the server doesn't support change streams.
+    """
+    global _resume_token
+    async with mongodb.db.watch(
+        change_stream_pipeline(),
+        full_document="updateLookup",
+        resume_after=_resume_token,
+    ) as stream:
+        _stats["mode"] = "change_stream"
+        logger.info(f"Tailing change streams{' from the last resume token' if _resume_token else ''}")
+        async for change in stream:
+            apply_change(change)
+            if change["operationType"] == "invalidate":
+                # An invalidated stream can't be resumed
+                _resume_token = None
+                return
+            _resume_token = stream.resume_token
+
+
+async def poll_caches(interval: float = CACHE_POLL_SECONDS) -> None:
+    """
+    Revalidate every cache until cancelled
+    """
+    _stats["mode"] = "poll"
+    logger.info(f"Polling cached documents every {interval} s")
+    while True:
+        await asyncio.sleep(interval)
+        for cache in all_caches():
+            try:
+                _stats["poll_evictions"] += await cache.revalidate()
+            except Exception as e:
+                logger.error(f"Error revalidating cache {cache.name}: {str(e)}")
+        _stats["poll_rounds"] += 1
+
+
+async def run_invalidation_bus(mode: str = CACHE_INVALIDATION_MODE) -> None:
+    """
+    Keep this worker's caches consistent with writes from every worker,
+    until cancelled
+    """
+    global _resume_token
+    while mode != "poll":
+        try:
+            await tail_change_stream()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                logger.warning("MongoDB doesn't support change streams (not a replica set), "
+                               "falling back to polling")
+                break
+            if e.code == CHANGE_STREAM_HISTORY_LOST:
+                # Events since the token are gone, so anything cached may be stale
+                logger.warning("Change stream history lost, clearing local caches")
+                _stats["history_lost"] += 1
+                _resume_token = None
+                for cache in all_caches():
+                    cache.clear()
+            else:
+                logger.error(f"Change stream error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Change stream error: {str(e)}")
+        _stats["reconnects"] += 1
+        _stats["mode"] = "reconnecting"
+        await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+    await poll_caches()
+
+
+def invalidation_stats() -> dict:
+    return {**_stats, "has_resume_token": _resume_token is not None}
@@ -0,0 +1,166 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from app.db.mongodb import get_collection
+from app.services.single_flight import get_single_flight
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how stale an entry can get if its invalidation is missed,
+# e.g. while the invalidation bus reconnects
+LOCAL_CACHE_TTL_SECONDS = settings.get_float("LOCAL_CACHE_TTL_SECONDS", 300)
+LOCAL_CACHE_MAX_ENTRIES = settings.get_int("LOCAL_CACHE_MAX_ENTRIES", 10000)
+
+# Caches by the collection their documents come from
+caches: Dict[str, List["LocalCache"]] = {}
+
+
+class LocalCache:
+    """
+    In-process cache of documents from one collection, looked up by a
+    unique field.
+
+    Entries are evicted when the invalidation bus reports a change to
+    their document, after LOCAL_CACHE_TTL_SECONDS, or least recently used
+    beyond max_entries. Concurrent misses for a key share one query.
+    """
+
+    def __init__(self, name: str, collection: str, key_field: str, projection: Optional[dict] = None,
+                 hint: Optional[list] = None, ttl: float = LOCAL_CACHE_TTL_SECONDS,
+                 max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.collection = collection
+        self.key_field = key_field
+        self.projection = projection
+        # Index for the lookups, e.g. one that covers the projection
+        self.find_options = {"hint": hint} if hint else {}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, dict]]" = OrderedDict()
+        self._keys_by_id: Dict[Any, Hashable] = {}
+        # Bumped by every eviction, so a load that raced one isn't stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        caches.setdefault(collection, []).append(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._entries)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        # Callers may modify what they get back
+        return dict(doc)
+
+    def set(self, key: Hashable, doc: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, doc)
+        self._entries.move_to_end(key)
+        if "_id" in doc:
+            self._keys_by_id[doc["_id"]] = key
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    async def get_or_load(self, key: Hashable) -> Optional[dict]:
+        """
+        The cached document for key, loading it on a miss. Missing
+        documents aren't cached.
+        """
+        doc = self.get(key)
+        if doc is not None:
+            self.hits += 1
+            return doc
+        self.misses += 1
+        doc = await get_single_flight(f"cache.{self.name}").do(key, self._load, key)
+        return dict(doc) if doc is not None else None
+
+    async def _load(self, key: Hashable) -> Optional[dict]:
+        generation = self._generation
+        collection = get_collection(self.collection)
+        doc = await collection.find_one({self.key_field: key}, self.projection, **self.find_options)
+        if doc is not None and generation == self._generation:
+            self.set(key, doc)
+        return doc
+
+    def _evict(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._keys_by_id.pop(entry[1].get("_id"), None)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._generation += 1
+        if key in self._entries:
+            self.invalidations += 1
+            self._evict(key)
+
+    def invalidate_document(self, doc_id: Any, key: Optional[Hashable] = None) -> None:
+        """
+        Evict a changed document by its _id, and by key when the change
+        carries it (the key of an updated document may have changed too)
+        """
+        self._generation += 1
+        for cached_key in {self._keys_by_id.get(doc_id), key} - {None}:
+            if cached_key in self._entries:
+                self.invalidations += 1
+                self._evict(cached_key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._keys_by_id.clear()
+
+    async def revalidate(self) -> int:
+        """
+        Re-read every cached document in one query and evict the ones that
+        changed or disappeared
+
+        Returns:
+            The number of entries evicted
+        """
+        keys = self.keys()
+        if not keys:
+            return 0
+        generation = self._generation
+        cursor = get_collection(self.collection).find({self.key_field: {"$in": keys}}, self.projection,
+                                                      **self.find_options)
+        current = {doc[self.key_field]: doc async for doc in cursor}
+        if generation != self._generation:
+            # Entries moved while reading; the next round re-checks them
+            return 0
+        evicted = 0
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and current.get(key) != entry[1]:
+                self.invalidations += 1
+                self._evict(key)
+                evicted += 1
+        return evicted
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def all_caches() -> List[LocalCache]:
+    return [cache for collection_caches in caches.values() for cache in collection_caches]
+
+
+def local_cache_stats() -> Dict[str, dict]:
+    return {cache.name: cache.stats() for cache in all_caches()}
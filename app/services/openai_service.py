@@ -1,124 +1,271 @@
-import openai
-import os
-from dotenv import load_dotenv
 import logging
-from typing import List, Dict, Any, Optional
-from app.data.destinations import destinations
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.db.mongodb import get_destinations_collection
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from app.services.resilience import get_dependency
+from app.services.destination_catalogue import bump_catalogue_version
+from app.services.tracing import traced
+from app.services.embeddings import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, embedding_stamp
+from app.config import settings
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Get API key from environment variable
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_KEY = settings.get("OPENAI_API_KEY")
+OPENAI_TIMEOUT_SECONDS = settings.get_float("OPENAI_TIMEOUT_SECONDS", 30)
 
-# Set up OpenAI client
-if OPENAI_API_KEY:
-    openai.api_key = OPENAI_API_KEY
-else:
+if not OPENAI_API_KEY:
     logger.warning("OpenAI API key not found. OpenAI services will not work.")
 
+USER_SUMMARY_INSTRUCTIONS = "You are an expert travel assistant generating personalized travel profiles. Based on the user's quiz answers, write a concise but rich paragraph summarizing their travel personality, including their interests, energy level, travel style, budget, preferred destinations, and social preferences. Use a natural, human tone. The persona should feel like a person you could recommend a city to — include what types of places they like, how they like to travel, and what matters most to them."
+
+
+def openai_client(asynchronous: bool = False):
+    """
+    Create an OpenAI client. The openai package takes most of a second to
+    import, so it is only imported on first use.
+    """
+    import openai
+    client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+    return client_class(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT_SECONDS, max_retries=0)
+
+
+def embedding_options() -> Dict[str, Any]:
+    """
+    Extra embeddings.create arguments for the configured vector size
+    """
+    return {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+
+
 class OpenAIService:
     """
     Service for interacting with OpenAI's API.
     """
     
     @staticmethod
+    @traced("openai.generate_user_summary")
     async def generate_user_summary(prompt: str) -> Optional[str]:
         if not OPENAI_API_KEY:
             logger.error("OpenAI API key not set. Unable to generate response.")
             return None
         
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            return None
+        
         try:
-            client = openai.OpenAI()
+            client = openai_client(asynchronous=True)
 
-            response = client.responses.create(
+            response = await client.responses.create(
                 model="gpt-4.1-mini",
-                input="You are an expert travel assistant generating personalized travel profiles. Based on the user's quiz answers, write a concise but rich paragraph summarizing their travel personality, including their interests, energy level, travel style, budget, preferred destinations, and social preferences. Use a natural, human tone. The persona should feel like a person you could recommend a city to — include what types of places they like, how they like to travel, and what matters most to them." + prompt
+                input=USER_SUMMARY_INSTRUCTIONS + prompt
             )
+            openai_dependency.record_success()
             
             return response.output_text
         except Exception as e:
+            openai_dependency.record_failure()
             logger.error(f"Error generating OpenAI response: {str(e)}")
             return None
     
     
     
     @staticmethod
+    async def stream_user_summary(prompt: str) -> AsyncIterator[str]:
+        """
+        Generate the user summary, yielding text deltas as they arrive
+
+        Raises:
+            RuntimeError: if OpenAI is unavailable or the generation fails
+        """
+        if not OPENAI_API_KEY:
+            raise RuntimeError("OpenAI API key not set. Unable to generate response.")
+
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            raise RuntimeError("OpenAI unavailable")
+
+        try:
+            client = openai_client(asynchronous=True)
+            stream = await client.responses.create(
+                model="gpt-4.1-mini",
+                input=USER_SUMMARY_INSTRUCTIONS + prompt,
+                stream=True
+            )
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type in ("response.failed", "error"):
+                    raise RuntimeError(f"Summary generation failed: {event.type}")
+            openai_dependency.record_success()
+        except Exception as e:
+            openai_dependency.record_failure()
+            logger.error(f"Error streaming OpenAI response: {str(e)}")
+            raise
+
+    @staticmethod
+    @traced("openai.generate_embedding")
     async def generate_embedding(prompt: str) -> Optional[str]:
 
         if not OPENAI_API_KEY:
             logger.error("OpenAI API key not set. Unable to generate response.")
             return None
         
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            return None
+        
         try:
-            client = openai.OpenAI()
-            response = client.embeddings.create(
-                model="text-embedding-3-small",
+            client = openai_client(asynchronous=True)
+            response = await client.embeddings.create(
+                model=EMBEDDING_MODEL,
                 input=prompt,
+                **embedding_options()
             )
+            openai_dependency.record_success()
             
             return response.data[0].embedding
         except Exception as e:
+            openai_dependency.record_failure()
             logger.error(f"Error generating OpenAI response: {str(e)}")
             return None
 
     @staticmethod
-    async def generate_destination_embeddings() -> Optional[str]:
+    @traced("openai.generate_embeddings", lambda args: {"openai.inputs": len(args.get("texts") or [])})
+    async def generate_embeddings(texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed several texts with a single request, in input order
+        """
+        if not OPENAI_API_KEY:
+            logger.error("OpenAI API key not set. Unable to generate response.")
+            return None
+
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            return None
+
+        try:
+            client = openai_client(asynchronous=True)
+            response = await client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts,
+                **embedding_options()
+            )
+            openai_dependency.record_success()
+
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            openai_dependency.record_failure()
+            logger.error(f"Error generating OpenAI embeddings: {str(e)}")
+            return None
+
+    @staticmethod
+    @traced("openai.generate_destination_profile", lambda args: {"destination.city": args.get("city")})
+    async def generate_destination_profile(city: str, country: str) -> Optional[str]:
+        """
+        Write the personality-style profile a destination is embedded from
+        """
         if not OPENAI_API_KEY:
             logger.error("OpenAI API key not set. Unable to generate response.")
             return None
 
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            return None
+
+        try:
+            client = openai_client(asynchronous=True)
+            response = await client.responses.create(
+                model="gpt-4.1-mini",
+                input=f"Describe the city {city}, {country}. You are a travel assistant generating personality-style profiles for cities, to match them with the right travelers. For each city, write a rich, 4-5 sentence paragraph that describes: The city's overall vibe and energy level Its cultural strengths (food, nightlife, history, nature, etc.)The types of travelers who typically enjoy it The typical budget level (low, medium, high) The pace of life (fast, relaxed, mixed) Avoid listing specific attractions. Instead, describe the feeling of visiting, and what kind of person would fall in love with the place"
+            )
+            openai_dependency.record_success()
+
+            return response.output_text
+        except Exception as e:
+            openai_dependency.record_failure()
+            logger.error(f"Error generating destination profile: {str(e)}")
+            return None
+
+    @staticmethod
+    async def generate_destination_embeddings() -> bool:
+        """
+        Embed the seeded destinations that have no embedding yet.
+
+        Returns True once every destination is embedded, False if OpenAI is
+        not configured or unavailable; a later call resumes where this one
+        stopped.
+        """
+        if not OPENAI_API_KEY:
+            logger.error("OpenAI API key not set. Unable to generate destination embeddings.")
+            return False
+
         count = await get_destinations_collection().count_documents({"embedding": {"$ne": None}})
         if count >= 50:
             logger.info(f"Destinations collection already has {count} embeddings. Skipping.")
-            return
+            return True
 
+        from app.data.destinations import destinations
+        embedded = set(await get_destinations_collection().distinct(
+            "airport_code", {"embedding": {"$ne": None}}
+        ))
         try:
             for destination in destinations:
-                client = openai.OpenAI()
+                if destination['airport_code'] in embedded:
+                    continue
+                profile = await OpenAIService.generate_destination_profile(destination['city'], destination['country'])
+                if profile is None:
+                    logger.error("OpenAI unavailable, stopping destination embedding generation")
+                    return False
 
-                response = client.responses.create(
-                    model="gpt-4.1-mini",
-                    input=f"Describe the city {destination['city']}, {destination['country']}. You are a travel assistant generating personality-style profiles for cities, to match them with the right travelers. For each city, write a rich, 4-5 sentence paragraph that describes: The city's overall vibe and energy level Its cultural strengths (food, nightlife, history, nature, etc.)The types of travelers who typically enjoy it The typical budget level (low, medium, high) The pace of life (fast, relaxed, mixed) Avoid listing specific attractions. Instead, describe the feeling of visiting, and what kind of person would fall in love with the place"
-                )
-
-                destination_embedding = await OpenAIService.generate_embedding(response.output_text)
+                destination_embedding = await OpenAIService.generate_embedding(profile)
+                if destination_embedding is None:
+                    logger.error("OpenAI unavailable, stopping destination embedding generation")
+                    return False
 
-                get_destinations_collection().update_one(
+                # Keep the profile so that app/jobs/reembed.py can re-embed it
+                await get_destinations_collection().update_one(
                     {"airport_code": destination['airport_code']},
-                    {"$set": {"embedding": destination_embedding}}
+                    {"$set": {
+                        "profile": profile,
+                        "embedding": destination_embedding,
+                        **embedding_stamp("embedding")
+                    }}
                 )
     
         except Exception as e:
-            logger.error(f"Error generating OpenAI response: {str(e)}")
-            return None
+            logger.error(f"Error generating destination embeddings: {str(e)}")
+            return False
 
-
-        return OpenAIService.generate_embedding(response.output_text)
+        # Let every worker pick up the new embeddings
+        await bump_catalogue_version()
+        return True
 
     @staticmethod
+    @traced("openai.check_is_valid_destination")
     async def check_is_valid_destination(user_summary: str, cities: List[str]) -> Optional[str]:
         if not OPENAI_API_KEY:
             logger.error("OpenAI API key not set. Unable to generate response.")
             return None
         
+        openai_dependency = get_dependency("openai")
+        if not await openai_dependency.acquire():
+            return None
+        
         try:
-            client = openai.OpenAI()
+            client = openai_client(asynchronous=True)
 
-            response = client.responses.create(
+            response = await client.responses.create(
                 model="gpt-4.1-mini",
                 input=f"I have a user with the following summary: {user_summary}. Choose the 15 best cities for this user from the following list: {cities}. Answer with a list of cities separated by commas."
             )
+            openai_dependency.record_success()
 
             cities = response.output_text.split(",")
             cities = [city.strip() for city in cities]
 
             return cities
         except Exception as e:
+            openai_dependency.record_failure()
             logger.error(f"Error generating OpenAI response: {str(e)}")
             return None
 
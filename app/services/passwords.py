@@ -0,0 +1,110 @@
+import os
+import hmac
+import base64
+import hashlib
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+from fastapi import HTTPException, status
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost parameters. Raising them makes existing hashes get
+# transparently rehashed on the user's next login.
+PASSWORD_SCRYPT_N = settings.get_int("PASSWORD_SCRYPT_N", 2 ** 14)
+PASSWORD_SCRYPT_R = settings.get_int("PASSWORD_SCRYPT_R", 8)
+PASSWORD_SCRYPT_P = settings.get_int("PASSWORD_SCRYPT_P", 1)
+# Threads doing hashing work; scrypt releases the GIL while it runs
+PASSWORD_HASH_WORKERS = settings.get_int("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+# Hash operations allowed to wait or run at once before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = settings.get_int("PASSWORD_HASH_MAX_QUEUE", 64)
+PASSWORD_HASH_RETRY_AFTER = settings.get_int("PASSWORD_HASH_RETRY_AFTER", 1)
+
+SCHEME = "scrypt"
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending = 0
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=32
+    )
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _hash(password: str) -> str:
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return f"{SCHEME}${PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def _verify(password: str, stored: str) -> Tuple[bool, bool]:
+    if not stored.startswith(f"{SCHEME}$"):
+        # Legacy plain-text password from before hashing was introduced
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+
+    _, n, r, p, salt, digest = stored.split("$")
+    n, r, p = int(n), int(r), int(p)
+    candidate = _scrypt(password, base64.b64decode(salt), n, r, p)
+    valid = hmac.compare_digest(candidate, base64.b64decode(digest))
+    needs_rehash = (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return valid, needs_rehash
+
+
+async def _run(fn, *args):
+    """
+    Run hashing work on the bounded pool, rejecting it with 503 when the
+    queue is full so that a login burst can't pile up unbounded work
+    """
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_QUEUE:
+        logger.warning("Password hashing queue full, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hash a password with the current cost parameters
+    """
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored hash
+
+    Returns:
+        (valid, needs_rehash): needs_rehash is True when the stored hash is
+        plain text or uses outdated cost parameters
+    """
+    return await _run(_verify, password, stored)
+
+
+_dummy_hash = None
+
+
+async def verify_dummy_password(password: str) -> None:
+    """
+    Burn the same hashing time as a real check, so that unknown emails
+    take as long to reject as wrong passwords
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password("dummy-password")
+    await verify_password(password, _dummy_hash)
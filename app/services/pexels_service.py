@@ -1,19 +1,15 @@
-import os
 import logging
 from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-import requests
-import aiohttp
+from app.services.resilience import get_dependency, is_failure_status
+from app.services.single_flight import get_single_flight
+from app.services.tracing import traced
+from app.config import settings
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Get API key from environment variable
-PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
+PEXELS_API_KEY = settings.get("PEXELS_API_KEY")
+PEXELS_TIMEOUT_SECONDS = settings.get_float("PEXELS_TIMEOUT_SECONDS", 10)
 
 class PexelsService:
     """
@@ -22,7 +18,18 @@ class PexelsService:
     BASE_URL = "https://api.pexels.com/v1"
     
     @staticmethod
+    @traced("pexels.get_destination_photo", lambda args: {"destination.city": args.get("city")})
     async def get_destination_photo(city:str, country:str) -> Optional[Dict[str, Any]]:
+        """
+        Get a photo URL for a destination. Identical concurrent requests
+        share a single in-flight Pexels call.
+        """
+        return await get_single_flight("pexels.photo").do(
+            (city, country), PexelsService._get_destination_photo, city, country
+        )
+
+    @staticmethod
+    async def _get_destination_photo(city:str, country:str) -> Optional[Dict[str, Any]]:
         if not PEXELS_API_KEY:
             logger.error("Pexels API key not set. Unable to retrieve photos.")
             return None
@@ -50,6 +57,7 @@ class PexelsService:
             return None
     
     @staticmethod
+    @traced("pexels.search_photos")
     async def search_photos(
         query: str, 
         per_page: int = 10, 
@@ -80,19 +88,31 @@ class PexelsService:
         if size:
             params["size"] = size
         
+        pexels = get_dependency("pexels")
+        if not await pexels.acquire():
+            return None
+        
+        # aiohttp is imported on first use to keep startup fast
+        import aiohttp
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PEXELS_TIMEOUT_SECONDS)) as session:
                 async with session.get(
                     f"{PexelsService.BASE_URL}/search", 
                     headers=headers, 
                     params=params
                 ) as response:
                     if response.status == 200:
+                        pexels.record_success()
                         return await response.json()
                     else:
+                        if is_failure_status(response.status):
+                            pexels.record_failure()
+                        else:
+                            pexels.record_success()
                         logger.error(f"Pexels API error: {response.status}")
                         return None
         except Exception as e:
+            pexels.record_failure()
             logger.error(f"Error searching Pexels photos: {str(e)}")
             return None
 
@@ -0,0 +1,70 @@
+import logging
+from typing import Optional
+from app.db.mongodb import get_plans_collection, PLAN_STATUS_INDEX
+from app.services.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+MEMBERS = {"$ifNull": ["$users", []]}
+
+# Each counter computed from the plan document
+COUNTERS = {
+    "member_count": {"$size": MEMBERS},
+    "quiz_completed_count": {"$size": {"$filter": {
+        "input": MEMBERS, "cond": {"$eq": ["$$this.is_quiz_completed", True]}
+    }}},
+    "voted_count": {"$size": {"$filter": {
+        "input": MEMBERS, "cond": {"$eq": ["$$this.has_voted", True]}
+    }}},
+    # $sum over a missing array is 0
+    "total_likes": {"$sum": "$suggested_destinations.likes"},
+}
+
+# Plans where any stored counter differs from the computed one
+DRIFTED = {"$expr": {"$or": [{"$ne": [f"${field}", expression]} for field, expression in COUNTERS.items()]}}
+
+# Plans created before the counters were kept on the plan document. A join
+# or vote before the backfill stores some counters by $inc, so any missing
+# counter marks the plan
+MISSING_COUNTERS = {"$or": [{field: {"$exists": False}} for field in COUNTERS]}
+
+# Statuses served by /plan/{code}/status. Entries have no _id, so the
+# invalidation bus evicts them by code; plans are never deleted. Writers
+# evict their own worker's entry right away.
+plan_status_cache = LocalCache(
+    "plan_status", "plans", "code",
+    projection={"_id": 0, **{field: 1 for field, _ in PLAN_STATUS_INDEX}},
+    hint=PLAN_STATUS_INDEX,
+)
+
+
+def has_counters(status_doc: dict) -> bool:
+    return all(field in status_doc for field in COUNTERS)
+
+
+async def compute_plan_status(code: str) -> Optional[dict]:
+    """
+    The status of a plan computed from its members and suggestions, for
+    plans whose counters haven't been backfilled yet
+    """
+    pipeline = [
+        {"$match": {"code": code}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "code": 1, "version": {"$ifNull": ["$version", 0]}, **COUNTERS}},
+    ]
+    docs = await get_plans_collection().aggregate(pipeline).to_list(length=1)
+    return docs[0] if docs else None
+
+
+async def backfill_plan_counters() -> int:
+    """
+    Store the counters on plans missing any of them, all recomputed on the
+    server from the plan itself
+
+    Returns:
+        The number of plans backfilled
+    """
+    result = await get_plans_collection().update_many(MISSING_COUNTERS, [{"$set": COUNTERS}])
+    if result.modified_count:
+        logger.info(f"Backfilled the counters of {result.modified_count} plans")
+    return result.modified_count
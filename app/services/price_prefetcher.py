@@ -0,0 +1,165 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from app.db.mongodb import get_plans_collection, get_users_collection, get_jobs_collection
+from app.services.flight_price_service import FlightPriceService, Route, route_id
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Delay between prefetch cycles. Page loads fetch missing prices either
+# way; while the prefetcher runs they don't refresh stale ones. 0 disables it.
+PRICE_PREFETCH_INTERVAL_SECONDS = settings.get_float("PRICE_PREFETCH_INTERVAL_SECONDS", 600)
+# Amadeus requests allowed per cycle
+PRICE_PREFETCH_BUDGET = settings.get_int("PRICE_PREFETCH_BUDGET", 200)
+# Most recently active plans considered per cycle
+PRICE_PREFETCH_MAX_PLANS = settings.get_int("PRICE_PREFETCH_MAX_PLANS", 500)
+# Also prefetch the one-adult routes of ?pricing=group. They are only
+# fetched on demand by default, as prefetching them roughly doubles the
+# requests per plan and so halves the plans covered by the budget.
+PRICE_PREFETCH_GROUP_PRICING = settings.get_bool("PRICE_PREFETCH_GROUP_PRICING")
+
+PRICE_PREFETCH_ENABLED = PRICE_PREFETCH_INTERVAL_SECONDS > 0
+
+PREFETCH_JOB_ID = "price_prefetch"
+
+# Served by the last_activity_at index; recently active plans are mostly
+# still active, so few inactive ones are skipped
+ACTIVE_PLANS_SORT = [("last_activity_at", DESCENDING)]
+ACTIVE_PLAN_PROJECTION = {"_id": 0, "code": 1, "startDate": 1, "endDate": 1, "users.email": 1,
+                          "suggested_destinations.airport_code": 1}
+
+_stats = {
+    "cycles": 0,
+    "skipped_cycles": 0,
+    "last_cycle_at": None,
+    "last_cycle_seconds": None,
+    "last_plans": 0,
+    "last_routes_due": 0,
+    "last_routes_fetched": 0,
+}
+
+
+def active_plans_filter(now: datetime) -> dict:
+    """
+    Plans that haven't started yet and have suggestions
+    """
+    # Plan dates are stored as ISO strings, which compare chronologically
+    return {"startDate": {"$gt": now.isoformat()}, "suggested_destinations.0": {"$exists": True}}
+
+
+async def find_active_plans(limit: int = PRICE_PREFETCH_MAX_PLANS) -> List[dict]:
+    """
+    Active plans, most recently active first
+    """
+    cursor = get_plans_collection().find(
+        active_plans_filter(datetime.utcnow()), ACTIVE_PLAN_PROJECTION
+    ).sort(ACTIVE_PLANS_SORT).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def get_locations(plans: List[dict]) -> Dict[str, Optional[str]]:
+    emails = list({user["email"] for plan in plans for user in plan.get("users", [])})
+    cursor = get_users_collection().find({"email": {"$in": emails}}, {"_id": 0, "email": 1, "location": 1})
+    return {user_doc["email"]: user_doc.get("location") or None async for user_doc in cursor}
+
+
+def plan_routes(plan: dict, locations: Dict[str, Optional[str]],
+                group_pricing: bool = PRICE_PREFETCH_GROUP_PRICING) -> List[Route]:
+    """
+    The routes a plan's suggestions page asks for in the default user
+    pricing: the whole group from each member's origin. With group_pricing
+    also one adult from each origin, as asked for by group pricing.
+    """
+    outbound_date = plan["startDate"][:10]
+    inbound_date = plan["endDate"][:10]
+    users = plan.get("users", [])
+    origins = {locations.get(user["email"]) for user in users} - {None}
+    adults = sorted({max(len(users), 1), *([1] if group_pricing else [])})
+    return [
+        (origin, suggestion["airport_code"], outbound_date, inbound_date, count)
+        for origin in sorted(origins)
+        for suggestion in plan["suggested_destinations"]
+        for count in adults
+    ]
+
+
+async def prefetch_prices(budget: int = PRICE_PREFETCH_BUDGET,
+                          interval: float = PRICE_PREFETCH_INTERVAL_SECONDS) -> dict:
+    """
+    Run one prefetch cycle: refresh the routes of active plans that would
+    go stale before the next cycle, in plan priority order, up to budget
+    Amadeus requests
+    """
+    start = time.monotonic()
+    plans = await find_active_plans()
+    locations = await get_locations(plans)
+
+    # Highest priority first, without duplicates
+    routes = list(dict.fromkeys(route for plan in plans for route in plan_routes(plan, locations)))
+    stored = await FlightPriceService.get_stored_prices(routes)
+    horizon = datetime.utcnow() + timedelta(seconds=interval)
+    due = [route for route in routes if not FlightPriceService.is_fresh(stored.get(route_id(route)), horizon)]
+
+    fetched = due[:budget]
+    if fetched:
+        await FlightPriceService.refresh_routes(fetched)
+
+    _stats.update({
+        "cycles": _stats["cycles"] + 1,
+        "last_cycle_at": datetime.utcnow(),
+        "last_cycle_seconds": time.monotonic() - start,
+        "last_plans": len(plans),
+        "last_routes_due": len(due),
+        "last_routes_fetched": len(fetched),
+    })
+    logger.info(f"Price prefetch: {len(plans)} active plans, {len(due)} routes due, "
+                f"{len(fetched)} fetched")
+    return dict(_stats)
+
+
+async def acquire_cycle_lease(interval: float) -> bool:
+    """
+    Let only one process run each cycle, however many workers are running
+    """
+    now = datetime.utcnow()
+    try:
+        # Matches a free or expired lease; otherwise the upsert collides
+        # with the held one
+        await get_jobs_collection().update_one(
+            {"_id": PREFETCH_JOB_ID, "lease_until": {"$not": {"$gt": now}}},
+            {"$set": {"lease_until": now + timedelta(seconds=interval * 0.9)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another process holds the lease
+        return False
+    return True
+
+
+async def run_price_prefetcher(interval: float = PRICE_PREFETCH_INTERVAL_SECONDS) -> None:
+    """
+    Run prefetch cycles until cancelled
+    """
+    while True:
+        try:
+            if await acquire_cycle_lease(interval):
+                await prefetch_prices()
+            else:
+                _stats["skipped_cycles"] += 1
+        except Exception as e:
+            logger.error(f"Error prefetching prices: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def prefetch_stats() -> dict:
+    return {
+        "enabled": PRICE_PREFETCH_ENABLED,
+        "interval_seconds": PRICE_PREFETCH_INTERVAL_SECONDS,
+        "budget": PRICE_PREFETCH_BUDGET,
+        **_stats,
+    }
@@ -0,0 +1,129 @@
+import os
+import asyncio
+import hmac
+import time
+import uuid
+import random
+import logging
+from typing import List
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The middleware is only installed when enabled, so it costs nothing when off
+PROFILING_ENABLED = settings.get_bool("PROFILING_ENABLED")
+# Requests sending this value in the X-Profile header are profiled
+PROFILING_TOKEN = settings.get("PROFILING_TOKEN") or settings.get("ADMIN_TOKEN")
+# Fraction of other requests profiled at random
+PROFILING_SAMPLE_RATE = settings.get_float("PROFILING_SAMPLE_RATE", 0)
+PROFILING_DIR = settings.get("PROFILING_DIR", "profiles")
+# Oldest profiles are deleted beyond this many
+PROFILING_MAX_FILES = settings.get_int("PROFILING_MAX_FILES", 50)
+# "html" (pyinstrument flame view) or "speedscope" (JSON for speedscope.app)
+PROFILING_FORMAT = settings.get("PROFILING_FORMAT", "html")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_PATH_HEADER = b"x-profile-path"
+EXTENSIONS = {"html": "html", "speedscope": "speedscope.json"}
+
+
+def list_profiles() -> List[str]:
+    """
+    Stored profile file names, newest first
+    """
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    names = [name for name in os.listdir(PROFILING_DIR) if name.startswith("profile-")]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(PROFILING_DIR, name)), reverse=True)
+
+
+def enforce_retention(max_files: int = PROFILING_MAX_FILES) -> None:
+    for name in list_profiles()[max_files:]:
+        try:
+            os.remove(os.path.join(PROFILING_DIR, name))
+        except OSError:
+            pass
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware profiling selected requests with pyinstrument.
+
+    A request is profiled when its X-Profile header carries the profiling
+    token, or at random at PROFILING_SAMPLE_RATE. Profiles record wall-clock
+    time with await attribution, are written to PROFILING_DIR and named in
+    the X-Profile-Path response header.
+    """
+
+    def __init__(self, app):
+        from pyinstrument import Profiler
+        self.app = app
+        self.profiler_class = Profiler
+        self.active = False
+
+    def _should_profile(self, scope) -> bool:
+        if self.active:
+            # One profile at a time keeps them readable and the overhead bounded
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return bool(PROFILING_TOKEN) and hmac.compare_digest(value.decode(), PROFILING_TOKEN)
+        return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = f"profile-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.{EXTENSIONS[PROFILING_FORMAT]}"
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_PATH_HEADER, name.encode())]
+            await send(message)
+
+        profiler = self.profiler_class(async_mode="enabled")
+        self.active = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.stop()
+            self.active = False
+            # Rendering a profile takes long enough to stall the event loop
+            await asyncio.to_thread(self._write, profiler, name, scope)
+
+    def _write(self, profiler, name: str, scope) -> None:
+        try:
+            os.makedirs(PROFILING_DIR, exist_ok=True)
+            if PROFILING_FORMAT == "speedscope":
+                from pyinstrument.renderers import SpeedscopeRenderer
+                output = profiler.output(renderer=SpeedscopeRenderer())
+            else:
+                output = profiler.output_html()
+            with open(os.path.join(PROFILING_DIR, name), "w") as f:
+                f.write(output)
+            enforce_retention()
+            logger.info(f"Profiled {scope['method']} {scope['path']} to {name}")
+        except Exception as e:
+            logger.error(f"Error writing profile {name}: {str(e)}")
+
+
+def install_profiler(app) -> bool:
+    """
+    Add the profiler middleware when profiling is enabled and pyinstrument
+    is installed
+    """
+    if not PROFILING_ENABLED:
+        return False
+    if PROFILING_FORMAT not in EXTENSIONS:
+        logger.error(f"Unknown PROFILING_FORMAT {PROFILING_FORMAT}, profiling disabled")
+        return False
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        logger.error("PROFILING_ENABLED is set but pyinstrument is not installed")
+        return False
+    app.add_middleware(ProfilerMiddleware)
+    logger.info(f"Request profiling enabled, writing profiles to {PROFILING_DIR}")
+    return True
@@ -0,0 +1,178 @@
+import os
+import uuid
+import json
+import socket
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import ReturnDocument
+from app.db.mongodb import get_quiz_jobs_collection
+from app.services import readiness
+from app.services.quiz_processing import process_quiz
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Worker tasks per process draining the queue. 0 leaves the queue to
+# other processes.
+QUIZ_WORKERS = settings.get_int("QUIZ_WORKERS", 2)
+# How long a claimed job stays owned by a worker without a heartbeat
+QUIZ_JOB_LEASE_SECONDS = settings.get_float("QUIZ_JOB_LEASE_SECONDS", 60)
+QUIZ_JOB_MAX_ATTEMPTS = settings.get_int("QUIZ_JOB_MAX_ATTEMPTS", 3)
+# Retry delay after the first failure, doubled on each later one
+QUIZ_JOB_RETRY_BASE_SECONDS = settings.get_float("QUIZ_JOB_RETRY_BASE_SECONDS", 5)
+# Idle delay between polls of an empty queue
+QUIZ_JOB_POLL_SECONDS = settings.get_float("QUIZ_JOB_POLL_SECONDS", 1)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Oldest runnable job first
+CLAIM_SORT = [("available_at", 1)]
+
+
+def answers_hash(preferences: List[dict], location: str) -> str:
+    payload = json.dumps({"preferences": preferences, "location": location}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def enqueue_quiz_job(email: str, code: str, preferences: List[dict], location: str) -> dict:
+    """
+    Queue quiz processing for a user in a plan.
+
+    There is one job per (user, plan). Submitting the same answers again
+    returns the existing job unless it failed; new answers replace it.
+    """
+    jobs = get_quiz_jobs_collection()
+    digest = answers_hash(preferences, location)
+
+    existing = await jobs.find_one({"email": email, "code": code})
+    if existing and existing["answers_hash"] == digest and existing["status"] != FAILED:
+        return existing
+
+    now = datetime.utcnow()
+    return await jobs.find_one_and_update(
+        {"email": email, "code": code},
+        {"$set": {
+            "job_id": uuid.uuid4().hex,
+            "answers_hash": digest,
+            "preferences": preferences,
+            "location": location,
+            "status": QUEUED,
+            "attempts": 0,
+            "available_at": now,
+            "lease_owner": None,
+            "lease_until": None,
+            "error": None,
+            "result": None,
+            "updated_at": now,
+        }, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def get_quiz_job(job_id: str, email: str) -> Optional[dict]:
+    return await get_quiz_jobs_collection().find_one({"job_id": job_id, "email": email}, {"preferences": 0})
+
+
+def runnable_jobs_filter(now: datetime) -> dict:
+    """
+    Queued jobs that are due, and running ones whose worker stopped
+    renewing the lease
+    """
+    return {"$or": [
+        {"status": QUEUED, "available_at": {"$lte": now}},
+        {"status": RUNNING, "lease_until": {"$lt": now}},
+    ]}
+
+
+async def claim_quiz_job(worker_id: str) -> Optional[dict]:
+    """
+    Lease the oldest runnable job
+    """
+    now = datetime.utcnow()
+    return await get_quiz_jobs_collection().find_one_and_update(
+        runnable_jobs_filter(now),
+        {"$set": {
+            "status": RUNNING,
+            "lease_owner": worker_id,
+            "lease_until": now + timedelta(seconds=QUIZ_JOB_LEASE_SECONDS),
+            "updated_at": now,
+        }, "$inc": {"attempts": 1}},
+        sort=CLAIM_SORT,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _renew_lease(job_id: str, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(QUIZ_JOB_LEASE_SECONDS / 3)
+        await get_quiz_jobs_collection().update_one(
+            {"job_id": job_id, "lease_owner": worker_id},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=QUIZ_JOB_LEASE_SECONDS)}}
+        )
+
+
+async def _finish(job: dict, worker_id: str, update: dict) -> None:
+    # Only the lease owner may finish a job; it may have been replaced by
+    # new answers or re-leased after a stall in the meantime
+    await get_quiz_jobs_collection().update_one(
+        {"job_id": job["job_id"], "lease_owner": worker_id},
+        {"$set": {**update, "lease_owner": None, "lease_until": None, "updated_at": datetime.utcnow()}}
+    )
+
+
+async def run_quiz_job(job: dict, worker_id: str) -> None:
+    if job["attempts"] > QUIZ_JOB_MAX_ATTEMPTS:
+        # Its worker died on every attempt
+        await _finish(job, worker_id, {"status": FAILED, "error": "Worker lease expired too many times"})
+        return
+
+    heartbeat = asyncio.create_task(_renew_lease(job["job_id"], worker_id))
+    try:
+        result = await process_quiz(job["email"], job["code"], job["preferences"], job["location"])
+    except Exception as e:
+        logger.error(f"Quiz job {job['job_id']} attempt {job['attempts']} failed: {str(e)}")
+        if job["attempts"] >= QUIZ_JOB_MAX_ATTEMPTS:
+            await _finish(job, worker_id, {"status": FAILED, "error": str(e)})
+        else:
+            delay = QUIZ_JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+            await _finish(job, worker_id, {
+                "status": QUEUED,
+                "error": str(e),
+                "available_at": datetime.utcnow() + timedelta(seconds=delay),
+            })
+        return
+    finally:
+        heartbeat.cancel()
+
+    await _finish(job, worker_id, {"status": SUCCEEDED, "error": None, "result": result})
+
+
+async def quiz_worker(worker_id: str) -> None:
+    """
+    Drain the quiz job queue until cancelled
+    """
+    while True:
+        try:
+            # Ranking needs the destination catalogue
+            job = await claim_quiz_job(worker_id) if readiness.is_ready("catalogue") else None
+            if job is None:
+                await asyncio.sleep(QUIZ_JOB_POLL_SECONDS)
+                continue
+            await run_quiz_job(job, worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Quiz worker {worker_id} error: {str(e)}")
+            await asyncio.sleep(QUIZ_JOB_POLL_SECONDS)
+
+
+def start_quiz_workers(count: int = QUIZ_WORKERS) -> List[asyncio.Task]:
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    return [asyncio.create_task(quiz_worker(f"{prefix}:{i}")) for i in range(count)]
@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Tuple
+from app.db.mongodb import get_users_collection, get_plans_collection
+from app.services.openai_service import OpenAIService
+from app.services.destination_catalogue import get_catalogue
+from app.services.embeddings import embedding_stamp
+from app.services.auth import user_cache
+from app.services.plan_counters import plan_status_cache
+
+logger = logging.getLogger(__name__)
+
+
+class QuizProcessingError(Exception):
+    """
+    A step of quiz processing failed; the job may be retried
+    """
+
+
+def member_filter(code: str, email: str) -> dict:
+    return {"users.email": email, "code": code}
+
+
+def first_quiz_completion_filter(code: str, email: str) -> dict:
+    """
+    The plan while the user hasn't completed the quiz in it yet
+    """
+    return {"code": code, "users": {"$elemMatch": {"email": email, "is_quiz_completed": {"$ne": True}}}}
+
+
+def build_preferences_prompt(preferences: List[dict]) -> str:
+    preferences_prompt = ""
+    for preference in preferences:
+        preferences_prompt += f"Question: '{preference['question']}' Answer: '{preference['answer']}'\n"
+    return preferences_prompt
+
+
+async def save_user_preferences(email: str, code: str, location: str, user_summary: str, user_embedding) -> None:
+    """
+    Store the summary and its embedding and mark the user's quiz as completed
+    """
+    logger.info(f"Updating user preferences for {email}")
+    await get_users_collection().update_one(
+        {"email": email},
+        {"$set": {
+            "location": location,
+            "preferences": user_embedding,
+            "preferences_summary": user_summary,
+            **embedding_stamp("preferences")
+        }}
+    )
+    # The location changed; other workers hear of it from the invalidation bus
+    user_cache.invalidate(email)
+    update = {"$set": {
+        "users.$.is_quiz_completed": True,
+        "last_activity_at": datetime.utcnow()
+    }, "$inc": {"version": 1}}
+    # The plan's completed counter only moves on the user's first completion
+    result = await get_plans_collection().update_one(
+        first_quiz_completion_filter(code, email),
+        {**update, "$inc": {"version": 1, "quiz_completed_count": 1}}
+    )
+    if not result.matched_count:
+        # Retaking the quiz
+        await get_plans_collection().update_one(member_filter(code, email), update)
+    plan_status_cache.invalidate(code)
+
+
+async def rank_destinations(email: str, code: str, user_summary: str, user_embedding) -> List[str]:
+    """
+    Pick the user's top destinations and store them on the plan
+
+    Returns:
+        The airport codes of the chosen destinations, best first
+    """
+    # Nearest-neighbour lookup over the current catalogue snapshot
+    sorted_destinations = get_catalogue().search(user_embedding, 25)
+
+    cities = [destination['city'] for destination, _ in sorted_destinations]
+
+    valid_cities = await OpenAIService.check_is_valid_destination(user_summary, cities)
+    if valid_cities is None:
+        raise QuizProcessingError("Failed to validate destinations")
+
+    top_destinations = [
+        destination['airport_code'] for destination, _ in sorted_destinations
+        if destination['city'] in valid_cities
+    ]
+
+    await get_plans_collection().update_one(
+        member_filter(code, email),
+        {"$set": {"users.$.top_destinations": top_destinations, "last_activity_at": datetime.utcnow()},
+         "$inc": {"version": 1}})
+    plan_status_cache.invalidate(code)
+    return top_destinations
+
+
+async def process_quiz(email: str, code: str, preferences: List[dict], location: str) -> dict:
+    """
+    Summarise the quiz answers, embed the summary and rank the catalogue
+    for the user
+
+    Returns:
+        {"summary": ..., "top_destinations": [...]}
+    """
+    user_summary = await OpenAIService.generate_user_summary(build_preferences_prompt(preferences))
+    if user_summary is None:
+        raise QuizProcessingError("Failed to generate user summary")
+
+    user_embedding = await OpenAIService.generate_embedding(user_summary)
+    if user_embedding is None:
+        raise QuizProcessingError("Failed to generate user embedding")
+
+    await save_user_preferences(email, code, location, user_summary, user_embedding)
+    top_destinations = await rank_destinations(email, code, user_summary, user_embedding)
+    return {"summary": user_summary, "top_destinations": top_destinations}
+
+
+async def stream_quiz(email: str, code: str, preferences: List[dict], location: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Same as process_quiz, but yields ("summary", delta) events while the
+    summary is generated, then ("destinations", top_destinations)
+    """
+    parts = []
+    try:
+        async for delta in OpenAIService.stream_user_summary(build_preferences_prompt(preferences)):
+            parts.append(delta)
+            yield "summary", delta
+    except Exception as e:
+        raise QuizProcessingError("Failed to generate user summary") from e
+    user_summary = "".join(parts)
+
+    user_embedding = await OpenAIService.generate_embedding(user_summary)
+    if user_embedding is None:
+        raise QuizProcessingError("Failed to generate user embedding")
+
+    await save_user_preferences(email, code, location, user_summary, user_embedding)
+    yield "destinations", await rank_destinations(email, code, user_summary, user_embedding)
@@ -0,0 +1,61 @@
+import logging
+from typing import Dict, Optional
+from fastapi import HTTPException, status
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Retry-After sent while a subsystem is still warming up
+READY_RETRY_AFTER_SECONDS = settings.get_int("READY_RETRY_AFTER_SECONDS", 5)
+
+# Subsystems reported by /ready, in the order they warm up
+SUBSYSTEMS = ["mongo", "destinations", "embeddings", "catalogue"]
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+_states: Dict[str, str] = {name: PENDING for name in SUBSYSTEMS}
+_errors: Dict[str, str] = {}
+
+
+def mark_ready(name: str) -> None:
+    if _states.get(name) != READY:
+        logger.info(f"Subsystem ready: {name}")
+    _states[name] = READY
+    _errors.pop(name, None)
+
+
+def mark_failed(name: str, error: Optional[str] = None) -> None:
+    logger.error(f"Subsystem failed to warm up: {name} ({error})")
+    _states[name] = FAILED
+    if error:
+        _errors[name] = error
+
+
+def is_ready(*names: str) -> bool:
+    return all(_states.get(name) == READY for name in (names or SUBSYSTEMS))
+
+
+def readiness_report() -> dict:
+    return {
+        "status": "ready" if is_ready() else "starting",
+        "subsystems": dict(_states),
+        "errors": dict(_errors),
+    }
+
+
+def require_ready(*names: str):
+    """
+    Dependency factory that returns 503 with Retry-After until the given
+    subsystems have warmed up
+    """
+    def check_ready():
+        if not is_ready(*names):
+            pending = [name for name in names if _states.get(name) != READY]
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Service warming up: {', '.join(pending)} not ready",
+                headers={"Retry-After": str(READY_RETRY_AFTER_SECONDS)},
+            )
+    return check_ready
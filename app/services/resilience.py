@@ -0,0 +1,195 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker configuration shared by every dependency
+CIRCUIT_FAILURE_THRESHOLD = settings.get_int("CIRCUIT_FAILURE_THRESHOLD", 5)
+CIRCUIT_RESET_SECONDS = settings.get_float("CIRCUIT_RESET_SECONDS", 30)
+CIRCUIT_HALF_OPEN_CALLS = settings.get_int("CIRCUIT_HALF_OPEN_CALLS", 1)
+# How long a call may wait for a rate-limit token before it is rejected
+RATE_LIMIT_MAX_WAIT = settings.get_float("RATE_LIMIT_MAX_WAIT", 2)
+
+# Requests per second and burst size, matched to each provider's quota:
+# Amadeus self-service allows 10 TPS on the test environment, Pexels
+# 200 requests per hour.
+DEPENDENCY_LIMITS = {
+    "amadeus": (settings.get_float("AMADEUS_RATE_LIMIT", 10), settings.get_int("AMADEUS_BURST", 10)),
+    "pexels": (settings.get_float("PEXELS_RATE_LIMIT", 200 / 3600), settings.get_int("PEXELS_BURST", 20)),
+    "openai": (settings.get_float("OPENAI_RATE_LIMIT", 50), settings.get_int("OPENAI_BURST", 50)),
+}
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter refilling at rate tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> bool:
+        """
+        Take a token, waiting up to max_wait seconds for it. Returns False
+        at once if the token wouldn't be available within max_wait.
+
+        The token is reserved before waiting (the balance may go negative),
+        so concurrent callers wait for their own turn in parallel rather
+        than one after another. Reserving doesn't await, so it can't
+        interleave with other callers.
+        """
+        self._refill()
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 and self.rate > 0 else 0.0
+        if self.tokens < 1 and (self.rate <= 0 or wait > max_wait):
+            return False
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with closed, open and half-open states.
+
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail fast. Once reset_timeout has passed, up to half_open_calls
+    probe requests are let through: a success closes the circuit, a
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS,
+                 half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            self.probes = 0
+        # Half-open: let a limited number of probes through. Probes that
+        # never report back are written off after another reset_timeout.
+        if self.probes >= self.half_open_calls and now - self.opened_at < self.reset_timeout:
+            return False
+        if self.probes >= self.half_open_calls:
+            self.opened_at = now
+            self.probes = 0
+        self.probes += 1
+        return True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit closed after successful probe")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probes = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probes = 0
+
+
+class Dependency:
+    """
+    Rate limiter and circuit breaker guarding one external API.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int):
+        self.name = name
+        self.limiter = TokenBucket(rate, capacity)
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.rate_limited = 0
+
+    async def acquire(self) -> bool:
+        """
+        Check whether a call may be made, waiting up to RATE_LIMIT_MAX_WAIT
+        for the rate limit. Returns False at once if the circuit is open,
+        or if the rate limit would delay the call for longer than that.
+        """
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            logger.warning(f"{self.name} circuit is {self.breaker.state}, failing fast")
+            return False
+        if not await self.limiter.acquire():
+            self.rate_limited += 1
+            logger.warning(f"{self.name} rate limit reached, rejecting call")
+            return False
+        self.calls += 1
+        return True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "rate_limited": self.rate_limited,
+            "rate_limit_per_second": self.limiter.rate,
+            "burst": self.limiter.capacity,
+        }
+
+
+dependencies: Dict[str, Dependency] = {
+    name: Dependency(name, rate, capacity) for name, (rate, capacity) in DEPENDENCY_LIMITS.items()
+}
+
+
+def get_dependency(name: str) -> Dependency:
+    return dependencies[name]
+
+
+def dependency_stats() -> Dict[str, dict]:
+    return {name: dependency.stats() for name, dependency in dependencies.items()}
+
+
+def is_failure_status(status: int) -> bool:
+    """
+    Statuses that mean the dependency itself is unhealthy or overloaded.
+    """
+    return status == 429 or status >= 500
@@ -0,0 +1,236 @@
+import os
+import hashlib
+import hmac
+import inspect
+import logging
+import functools
+from typing import Any, Callable, Dict, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tracing needs the optional opentelemetry-sdk package. When disabled, the
+# decorators and proxies below hand back the undecorated objects.
+TRACING_ENABLED = settings.get_bool("TRACING_ENABLED")
+# "console" prints spans to stdout, "file" appends one JSON span per line
+TRACING_EXPORTER = settings.get("TRACING_EXPORTER", "console")
+TRACING_FILE = settings.get("TRACING_FILE", "traces.jsonl")
+TRACING_SERVICE_NAME = settings.get("TRACING_SERVICE_NAME", "planeit-backend")
+# Key for the plan code hashes on spans; falls back to the JWT secret
+TRACING_SALT = settings.get("TRACING_SALT") or settings.get("SECRET_KEY", "your-secret-key-for-development")
+
+if TRACING_ENABLED:
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.error("TRACING_ENABLED is set but opentelemetry-sdk is not installed")
+        TRACING_ENABLED = False
+
+_provider = None
+
+
+def _tracer():
+    return trace.get_tracer("planeit")
+
+
+def hash_plan_code(code: str) -> str:
+    """
+    Plan codes grant access to a plan, so spans only carry a keyed hash.
+    Plan codes are short enough to brute-force a plain hash, but not an
+    HMAC without TRACING_SALT.
+    """
+    return hmac.new(TRACING_SALT.encode(), code.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+def set_span_attributes(attributes: Dict[str, Any]) -> None:
+    """
+    Add attributes to the current span, if tracing
+    """
+    if TRACING_ENABLED:
+        trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def traced(name: Optional[str] = None, attributes: Optional[Callable[[dict], Dict[str, Any]]] = None):
+    """
+    Run an async function in a child span
+
+    attributes receives the call's arguments by parameter name and returns
+    span attributes.
+    """
+    def decorator(fn):
+        if not TRACING_ENABLED:
+            return fn
+        span_name = name or fn.__qualname__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _tracer().start_as_current_span(span_name) as span:
+                if attributes:
+                    try:
+                        span.set_attributes(_clean(attributes(signature.bind_partial(*args, **kwargs).arguments)))
+                    except Exception as e:
+                        logger.debug(f"Could not compute attributes for {span_name}: {str(e)}")
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedCursor:
+    """
+    Wraps a Motor cursor so that fetching its documents is one span
+    """
+
+    def __init__(self, cursor, collection: str, operation: str):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "hint"):
+            @functools.wraps(attr)
+            def chain(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chain
+        return attr
+
+    def _start_span(self):
+        return _tracer().start_span(f"mongodb.{self._operation}", attributes={
+            "db.system": "mongodb",
+            "db.mongodb.collection": self._collection,
+            "db.operation": self._operation,
+        })
+
+    async def to_list(self, length=None):
+        with trace.use_span(self._start_span(), end_on_exit=True) as span:
+            documents = await self._cursor.to_list(length=length)
+            span.set_attribute("db.documents", len(documents))
+            return documents
+
+    async def __aiter__(self):
+        # Not made current: the span stays open across yields to the caller
+        span = self._start_span()
+        count = 0
+        try:
+            async for document in self._cursor:
+                count += 1
+                yield document
+        finally:
+            span.set_attribute("db.documents", count)
+            span.end()
+
+
+class TracedCollection:
+    """
+    Proxy for a Motor collection that runs every operation in a span
+    """
+
+    CURSOR_METHODS = ("find", "aggregate")
+    OPERATIONS = (
+        "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+        "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+        "delete_one", "delete_many", "count_documents", "estimated_document_count",
+        "distinct", "bulk_write",
+    )
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        collection_name = self._collection.name
+        if name in self.CURSOR_METHODS:
+            @functools.wraps(attr)
+            def cursor_method(*args, **kwargs):
+                return TracedCursor(attr(*args, **kwargs), collection_name, name)
+            return cursor_method
+        if name not in self.OPERATIONS:
+            return attr
+
+        @functools.wraps(attr)
+        async def operation(*args, **kwargs):
+            with _tracer().start_as_current_span(f"mongodb.{name}", attributes={
+                "db.system": "mongodb",
+                "db.mongodb.collection": collection_name,
+                "db.operation": name,
+            }):
+                return await attr(*args, **kwargs)
+        return operation
+
+
+def traced_collection(collection):
+    return TracedCollection(collection) if TRACING_ENABLED else collection
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving each HTTP request a root server span
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        # Named after the route template once routed; raw paths carry plan codes
+        with _tracer().start_as_current_span(f"{method}", kind=trace.SpanKind.SERVER,
+                                             attributes={"http.method": method}) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
+
+
+def setup_tracing(app) -> bool:
+    """
+    Configure the tracer provider and exporter and add the root span
+    middleware, when tracing is enabled
+    """
+    global _provider
+    if not TRACING_ENABLED:
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if TRACING_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(TRACING_FILE, "a"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        exporter = ConsoleSpanExporter()
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    app.add_middleware(TracingMiddleware)
+    logger.info(f"Tracing enabled with the {TRACING_EXPORTER} exporter")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """
+    Flush buffered spans
+    """
+    if _provider is not None:
+        _provider.shutdown()
@@ -0,0 +1,98 @@
+"""
+Compare the cost of looking up the user behind an authenticated request.
+
+Seeds users with a full-size preference vector into a scratch database
+on a local MongoDB, then resolves them the way authentication used to
+(the whole document validated into User), with the projected Principal,
+and through the worker's user cache. Reports the BSON bytes read from
+MongoDB and the CPU and wall time per lookup for each.
+
+Usage:
+    python -m benchmarks.benchmark_auth_lookup --users 200 --rounds 5
+"""
+import os
+
+# Never run against the application database
+os.environ["DB_NAME"] = os.getenv("AUTH_LOOKUP_DB_NAME", "planeit_auth_lookup")
+
+import argparse
+import asyncio
+import random
+import time
+import bson
+from app.db import mongodb
+from app.models.user import User
+from app.services.auth import PRINCIPAL_PROJECTION, user_cache, user_doc_to_principal
+
+VECTOR_SIZE = 1536
+
+
+def full_user(doc: dict) -> User:
+    doc["id"] = str(doc.pop("_id"))
+    return User(**doc)
+
+
+async def lookup_full(email: str):
+    doc = await mongodb.get_users_collection().find_one({"email": email})
+    return doc, full_user(dict(doc))
+
+
+async def lookup_principal(email: str):
+    doc = await mongodb.get_users_collection().find_one({"email": email}, PRINCIPAL_PROJECTION)
+    return doc, user_doc_to_principal(dict(doc))
+
+
+async def lookup_cached(email: str):
+    misses = user_cache.misses
+    doc = await user_cache.get_or_load(email)
+    # Hits read nothing from MongoDB
+    return doc if user_cache.misses > misses else None, user_doc_to_principal(dict(doc))
+
+
+async def measure(name: str, lookup, emails) -> None:
+    read_bytes = 0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for email in emails:
+        doc, _ = await lookup(email)
+        read_bytes += len(bson.encode(doc)) if doc is not None else 0
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    count = len(emails)
+    print(f"{name:<10} {read_bytes / count:>10.0f} B/lookup {cpu / count * 1e6:>9.0f} us CPU "
+          f"{wall / count * 1e6:>9.0f} us wall")
+
+
+async def run(users: int, rounds: int):
+    await mongodb.connect_to_mongo()
+    try:
+        collection = mongodb.get_users_collection()
+        await collection.delete_many({})
+        await collection.insert_many([
+            {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x" * 60,
+             "location": "LIS", "preferences": [random.random() for _ in range(VECTOR_SIZE)],
+             "preferences_summary": "Enjoys food, museums and walkable old towns. " * 10}
+            for i in range(users)
+        ])
+        emails = [f"user{i}@example.com" for i in range(users)] * rounds
+        # Warm the connection pool before timing
+        await lookup_principal(emails[0])
+
+        print(f"{len(emails)} lookups of {users} users with {VECTOR_SIZE}-float preference vectors")
+        await measure("full", lookup_full, emails)
+        await measure("principal", lookup_principal, emails)
+        # Only the first round misses the cache
+        await measure("cached", lookup_cached, emails)
+        await collection.delete_many({})
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
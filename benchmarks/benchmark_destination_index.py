@@ -0,0 +1,62 @@
+"""
+Recall@k vs latency benchmark for the destination nearest-neighbour index.
+
+Compares the IVF index against the exact scan on a synthetic clustered
+catalogue of embedding-sized vectors.
+
+Usage:
+    python -m benchmarks.benchmark_destination_index --size 20000 --dim 1536
+"""
+import argparse
+import time
+import numpy as np
+from app.services.destination_index import ExactIndex, IVFIndex
+
+
+def synthetic_catalogue(size, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, clusters, 200)] + 0.5 * rng.normal(size=(200, dim)).astype(np.float32)
+    return vectors, queries
+
+
+def timed_search(index, queries, k, exact=False):
+    start = time.perf_counter()
+    results = [[key for key, _ in index.search(query, k, exact=exact)] for query in queries]
+    elapsed = (time.perf_counter() - start) / len(queries)
+    return results, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=25)
+    args = parser.parse_args()
+
+    vectors, queries = synthetic_catalogue(args.size, args.dim, args.clusters)
+    keys = [f"D{i:06d}" for i in range(args.size)]
+
+    exact = ExactIndex()
+    exact.add(keys, vectors)
+    truth, exact_ms = timed_search(exact, queries, args.k)
+    print(f"exact scan: {exact_ms:.3f} ms/query over {args.size} vectors")
+
+    ivf = IVFIndex(min_train_size=0)
+    start = time.perf_counter()
+    ivf.add(keys, vectors)
+    print(f"ivf build: {time.perf_counter() - start:.2f} s, {len(ivf.centroids)} lists")
+
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        ivf.nprobe = nprobe
+        results, ivf_ms = timed_search(ivf, queries, args.k)
+        recall = np.mean([len(set(r) & set(t)) / args.k for r, t in zip(results, truth)])
+        print(f"ivf nprobe={nprobe:>3}: recall@{args.k}={recall:.3f} {ivf_ms:.3f} ms/query "
+              f"({exact_ms / ivf_ms:.1f}x exact)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Throughput scaling of the CPU-bound ranking path across forked workers.
+
+The catalogue matrix is built once in the parent and shared copy-on-write
+with the forked workers, as serve.py does with the preloaded catalogue.
+Each worker ranks random user embeddings against it for a fixed duration.
+
+Usage:
+    python -m benchmarks.benchmark_ranking_scaling --size 20000 --seconds 5
+"""
+import os
+
+# One BLAS thread per process so the scaling comes from the workers
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(variable, "1")
+
+import argparse
+import gc
+import multiprocessing
+import time
+import numpy as np
+from app.services.destination_index import ExactIndex
+
+index = None
+
+
+def worker(seconds, dim, results, seed):
+    rng = np.random.default_rng(seed)
+    queries = rng.normal(size=(64, dim)).astype(np.float32)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        index.search(queries[done % len(queries)], 25)
+        done += 1
+    results.put(done)
+
+
+def run(processes, seconds, dim):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=worker, args=(seconds, dim, results, i)) for i in range(processes)]
+    for process in workers:
+        process.start()
+    total = sum(results.get() for _ in workers)
+    for process in workers:
+        process.join()
+    return total / seconds
+
+
+def main():
+    global index
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = ExactIndex()
+    index.add([f"D{i:06d}" for i in range(args.size)], rng.normal(size=(args.size, args.dim)))
+    gc.freeze()
+    print(f"catalogue: {args.size} x {args.dim} ({index.vectors.nbytes / 1e6:.0f} MB shared)")
+
+    counts = sorted({1, 2, 4, 8, 16, args.max_workers} & set(range(1, args.max_workers + 1)))
+    baseline = None
+    for processes in counts:
+        throughput = run(processes, args.seconds, args.dim)
+        baseline = baseline or throughput
+        print(f"{processes:>3} workers: {throughput:9.1f} rankings/s  "
+              f"speedup {throughput / baseline:5.2f}x  efficiency {throughput / baseline / processes:5.0%}")
+
+
+if __name__ == "__main__":
+    main()
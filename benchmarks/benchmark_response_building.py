@@ -0,0 +1,116 @@
+"""
+Per-request CPU microbenchmark for the suggestions and plan response paths.
+
+"legacy" reproduces the previous builders: JSON round-trips through
+model_dump_json()/json.loads(), re-validating every DestinationSuggestion
+and serialising with the stdlib encoder. "current" uses the builders in
+app.routers.plan, a single response_model validation and orjson.
+
+Usage:
+    python -m benchmarks.benchmark_response_building --suggestions 10 --members 6
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import List
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.models.destination import DestinationSuggestion
+from app.models.plan import Plan, PlanUser, PlanResponse
+from app.routers.plan import plan_doc_to_model, suggestion_doc, suggestion_response
+
+
+def make_plan_doc(suggestions, members):
+    users = [PlanUser(name=f"User {i}", email=f"user{i}@example.com", is_quiz_completed=True,
+                      top_destinations=["BCN", "LIS", "ATH"]) for i in range(members)]
+    plan = Plan(
+        name="Summer trip",
+        description="Somewhere warm",
+        startDate=datetime(2026, 7, 1),
+        endDate=datetime(2026, 7, 8),
+        code="ABC123",
+        users=users,
+        creator=users[0],
+    )
+    plan_doc = plan.model_dump(mode="json")
+    plan_doc["suggested_destinations"] = [
+        suggestion_doc({
+            "country": "Spain",
+            "city": f"City {i}",
+            "airport_code": f"C{i:02d}",
+            "description": "A lovely place to visit",
+            "photo_url": f"https://images.example.com/{i}.jpg",
+        })
+        for i in range(suggestions)
+    ]
+    plan_doc["_id"] = "6650c0ffee"
+    return plan_doc
+
+
+def legacy_suggestions(plan_doc):
+    plan_data = plan_doc_to_model(dict(plan_doc))
+    response = []
+    for destination in plan_data.suggested_destinations:
+        destination_dict = destination.model_dump()
+        if destination_dict.get("image") is None:
+            destination_dict["image"] = destination_dict.get("photo_url")
+        destination_dict["price"] = float("199.99")
+        response.append(DestinationSuggestion(**destination_dict))
+    return json.dumps(jsonable_encoder(response)).encode()
+
+
+def current_suggestions(plan_doc, adapter):
+    plan_data = plan_doc_to_model(dict(plan_doc))
+    response = [suggestion_response(d.model_dump(), "199.99") for d in plan_data.suggested_destinations]
+    return orjson.dumps(adapter.dump_python(adapter.validate_python(response), mode="json"))
+
+
+def legacy_plan(plan_doc):
+    plan = Plan(**plan_doc)
+    plan_dict = json.loads(plan.model_dump_json())
+    plan_dict["id"] = "6650c0ffee"
+    return json.dumps(jsonable_encoder(plan_dict)).encode()
+
+
+def current_plan(plan_doc, adapter):
+    plan = Plan(**plan_doc)
+    plan_dict = plan.model_dump(mode="json")
+    plan_dict["id"] = "6650c0ffee"
+    return orjson.dumps(adapter.dump_python(adapter.validate_python(plan_dict), mode="json"))
+
+
+def cpu_per_call(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suggestions", type=int, default=10)
+    parser.add_argument("--members", type=int, default=6)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    plan_doc = make_plan_doc(args.suggestions, args.members)
+    suggestions_adapter = TypeAdapter(List[DestinationSuggestion])
+    plan_adapter = TypeAdapter(PlanResponse)
+
+    cases = [
+        ("suggestions", lambda: legacy_suggestions(plan_doc),
+         lambda: current_suggestions(plan_doc, suggestions_adapter)),
+        ("plan", lambda: legacy_plan(plan_doc),
+         lambda: current_plan(plan_doc, plan_adapter)),
+    ]
+    for name, legacy, current in cases:
+        legacy_us = cpu_per_call(legacy, args.iterations)
+        current_us = cpu_per_call(current, args.iterations)
+        print(f"{name:>12}: legacy {legacy_us:8.1f} us/request  current {current_us:8.1f} us/request  "
+              f"({legacy_us / current_us:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
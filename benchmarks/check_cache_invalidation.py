@@ -0,0 +1,130 @@
+"""
+Check that worker-local caches are evicted when another worker writes.
+
+Needs MongoDB running as a replica set (a single node is enough, see
+"Worker caches" in the README). Uses a scratch database, caches user
+documents through the auth user cache, and writes them through a second
+client standing in for another worker. Measures how long each update
+takes to evict the cached entry, then checks that a delete evicts by _id
+and that a bus restarted from its resume token replays the writes it
+missed. Exits non-zero if any eviction doesn't happen within the timeout.
+
+Usage:
+    python -m benchmarks.check_cache_invalidation --updates 200
+"""
+import os
+
+# Never run against the application database
+os.environ["DB_NAME"] = os.getenv("CACHE_CHECK_DB_NAME", "planeit_cache_check")
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from app.db import mongodb
+from app.services import invalidation
+from app.services.auth import user_cache
+
+
+async def wait_for(condition, timeout: float) -> float:
+    """
+    Seconds until condition() is true, or None after timeout
+    """
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        await asyncio.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def start_bus() -> asyncio.Task:
+    return asyncio.create_task(invalidation.run_invalidation_bus("auto"))
+
+
+async def stop_bus(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def run(updates: int, timeout: float) -> bool:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    await mongodb.connect_to_mongo()
+    # The other worker
+    other = AsyncIOMotorClient(mongodb.MONGO_URI)[mongodb.DB_NAME]["users"]
+    ok = True
+    try:
+        await other.delete_many({})
+        await other.insert_many([
+            {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x", "location": ""}
+            for i in range(updates)
+        ])
+
+        bus = start_bus()
+        if await wait_for(lambda: invalidation.invalidation_stats()["mode"] == "change_stream", timeout) is None:
+            print(f"change stream not open: mode {invalidation.invalidation_stats()['mode']}")
+            await stop_bus(bus)
+            return False
+        # The stream is opened right after the mode is set
+        await asyncio.sleep(0.2)
+
+        latencies = []
+        for i in range(updates):
+            email = f"user{i}@example.com"
+            await user_cache.get_or_load(email)
+            await other.update_one({"email": email}, {"$set": {"location": "LIS"}})
+            latency = await wait_for(lambda: email not in user_cache.keys(), timeout)
+            if latency is None:
+                print(f"update of {email} not evicted within {timeout} s")
+                ok = False
+                break
+            latencies.append(latency * 1000)
+        if latencies:
+            latencies.sort()
+            print(f"update eviction over {len(latencies)} writes: "
+                  f"p50 {statistics.median(latencies):.1f} ms, "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+        # A delete event only carries the _id
+        await user_cache.get_or_load("user0@example.com")
+        await other.delete_one({"email": "user0@example.com"})
+        latency = await wait_for(lambda: "user0@example.com" not in user_cache.keys(), timeout)
+        print(f"delete eviction: {'not evicted' if latency is None else f'{latency * 1000:.1f} ms'}")
+        ok = ok and latency is not None
+
+        # Writes while the bus is down are replayed from the resume token
+        await stop_bus(bus)
+        email = f"user{updates - 1}@example.com"
+        await user_cache.get_or_load(email)
+        await other.update_one({"email": email}, {"$set": {"location": "OPO"}})
+        await asyncio.sleep(0.2)
+        missed = email in user_cache.keys()
+        bus = start_bus()
+        latency = await wait_for(lambda: email not in user_cache.keys(), timeout)
+        print(f"resume: cached across the outage {missed}, "
+              f"{'not evicted' if latency is None else f'evicted {latency * 1000:.1f} ms after restart'}")
+        ok = ok and missed and latency is not None
+        await stop_bus(bus)
+
+        print(invalidation.invalidation_stats())
+        return ok
+    finally:
+        await other.delete_many({})
+        await mongodb.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for each eviction")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.updates, args.timeout)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Check that importing the app stays within a cold-start budget.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and
+takes the fastest cumulative time of main. Exits non-zero if it exceeds
+the budget, or if a dependency that should be imported on first use
+(openai, aiohttp, numpy, motor, jose, the destination seed list) was
+imported eagerly. The module check doesn't depend on machine speed, so
+it catches regressions even when the budget is generous.
+
+Usage:
+    python -m benchmarks.check_import_time --budget-ms 800 --runs 3
+"""
+import argparse
+import subprocess
+import sys
+
+# Cold-start budget for importing main, also asserted by tests/test_import_time.py
+BUDGET_MS = 800
+
+LAZY_MODULES = ("openai", "aiohttp", "numpy", "motor", "jose", "app.data.destinations")
+
+CHECK_MODULES = (
+    "import sys, main; "
+    "print(','.join(name for name in {modules!r} if name in sys.modules))"
+)
+
+
+def import_time_ms() -> float:
+    """
+    Cumulative import time of main, in milliseconds, in a fresh interpreter
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr}")
+    for line in reversed(result.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "main":
+            return int(parts[1]) / 1000
+    raise RuntimeError("main not found in -X importtime output")
+
+
+def eager_modules() -> list:
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_MODULES.format(modules=LAZY_MODULES)],
+        capture_output=True, text=True, check=True,
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode and filesystem caches
+    timings = [import_time_ms() for _ in range(args.runs)]
+    best = min(timings)
+    print(f"import main: best {best:.0f} ms of {', '.join(f'{t:.0f}' for t in timings)} "
+          f"(budget {args.budget_ms:.0f} ms)")
+
+    eager = eager_modules()
+    if eager:
+        print(f"imported eagerly: {', '.join(eager)}")
+
+    sys.exit(0 if best <= args.budget_ms and not eager else 1)
+
+
+if __name__ == "__main__":
+    main()
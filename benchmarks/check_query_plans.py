@@ -0,0 +1,265 @@
+"""
+Query-plan regression check for every hot MongoDB query shape.
+
+Seeds a synthetic dataset into a scratch database on a local MongoDB,
+creates the app's indexes with ensure_indexes(), then runs explain() on
+each query shape used by app/routers/plan.py, app/routers/user.py,
+app/routers/auth.py, app/services/auth.py, app/services/quiz_jobs.py,
+app/services/quiz_processing.py, app/services/price_prefetcher.py and
+app/services/flight_price_service.py. Filters, projections and sorts are
+built with the app's own helpers, so the check follows them.
+It fails if a shape doesn't use an index (COLLSCAN, or no IXSCAN) or
+examines more documents than it returns (or than its own limit), and
+reports each shape's latency. Covered shapes fail if they examine any
+document at all.
+
+Usage:
+    python -m benchmarks.check_query_plans --size 1000000
+"""
+import os
+
+# Never run against the application database
+os.environ["DB_NAME"] = os.getenv("QUERY_PLAN_DB_NAME", "planeit_query_plans")
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from app.db import mongodb
+from app.routers.auth import LOGIN_PROJECTION
+from app.routers.plan import PODIUM_PROJECTION, join_filter, first_vote_filter
+from app.services.auth import PRINCIPAL_PROJECTION
+from app.services.flight_price_service import route_id, routes_filter
+from app.services.plan_counters import plan_status_cache
+from app.services.price_prefetcher import (
+    ACTIVE_PLAN_PROJECTION, ACTIVE_PLANS_SORT, PRICE_PREFETCH_MAX_PLANS, active_plans_filter,
+)
+from app.services.quiz_jobs import CLAIM_SORT, runnable_jobs_filter
+from app.services.quiz_processing import first_quiz_completion_filter, member_filter
+
+BATCH_SIZE = 10000
+# Quiz jobs a worker could claim; the rest of the queue has finished
+RUNNABLE_JOBS = 50
+# Share of plans that have already started, spread over the activity order
+STARTED_PLAN_SHARE = 0.1
+# Stored flight prices per destination
+ROUTES_PER_DESTINATION = 20
+ORIGINS = ["BCN", "MAD", "LIS", "CDG"]
+
+
+def seed_route(i):
+    """The i-th stored route: every origin and group size for each destination in turn."""
+    return (ORIGINS[i % len(ORIGINS)], f"A{i // ROUTES_PER_DESTINATION % 1000:03d}", "2030-07-01", "2030-07-08",
+            1 + i // len(ORIGINS) % (ROUTES_PER_DESTINATION // len(ORIGINS)))
+
+
+def sort_spec(sort):
+    return {field: direction for field, direction in sort}
+
+
+def seed(db, size):
+    if (db.users.estimated_document_count() >= size and db.plans.estimated_document_count() >= size
+            and db.quiz_jobs.estimated_document_count() >= size and db.flight_prices.estimated_document_count()):
+        print(f"Reusing existing dataset of {size} users and plans")
+        return
+    db.users.drop()
+    db.plans.drop()
+    db.destinations.drop()
+    db.quiz_jobs.drop()
+    db.flight_prices.drop()
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    future, past = (now + timedelta(days=180)).isoformat(), (now - timedelta(days=180)).isoformat()
+    for offset in range(0, size, BATCH_SIZE):
+        count = min(BATCH_SIZE, size - offset)
+        db.users.insert_many([
+            {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x",
+             "location": random.choice(ORIGINS), "preferences": []}
+            for i in range(offset, offset + count)
+        ], ordered=False)
+        db.plans.insert_many([
+            {"name": f"Plan {i}", "code": f"P{i:07d}", "description": "",
+             "startDate": past if random.random() < STARTED_PLAN_SHARE else future, "endDate": future,
+             "last_activity_at": now - timedelta(seconds=i),
+             "users": [{"name": "", "email": f"user{(i + k) % size}@example.com", "is_quiz_completed": False,
+                        "top_destinations": [], "has_voted": False} for k in range(random.randint(1, 6))],
+             "suggested_destinations": [{"airport_code": f"A{i % 1000:03d}", "likes": 0}], "version": 1, "member_count": 1, "quiz_completed_count": 0,
+             "voted_count": 0, "total_likes": 0}
+            for i in range(offset, offset + count)
+        ], ordered=False)
+        db.quiz_jobs.insert_many([
+            {"job_id": f"J{i:07d}", "email": f"user{i}@example.com", "code": f"P{i:07d}",
+             **({"status": "queued", "available_at": now - timedelta(seconds=i), "lease_until": None}
+                if i < RUNNABLE_JOBS else
+                {"status": "succeeded", "available_at": now - timedelta(days=1), "lease_until": None})}
+            for i in range(offset, offset + count)
+        ], ordered=False)
+    db.destinations.insert_many([
+        {"city": f"City {i}", "country": "", "airport_code": f"A{i:03d}", "description": "", "embedding": None}
+        for i in range(1000)
+    ])
+    db.flight_prices.insert_many([
+        {"_id": route_id(seed_route(i)), "price": 100.0, "fetched_at": now}
+        for i in range(1000 * ROUTES_PER_DESTINATION)
+    ])
+    print(f"Seeded {size} users and plans in {time.perf_counter() - start:.1f} s")
+
+
+def query_shapes(size):
+    """
+    (name, command factory, expectations) for each query shape. max_examined
+    allows a shape to examine more documents than it returns; covered
+    shapes must not examine any.
+    """
+    email = lambda: f"user{random.randrange(size)}@example.com"
+    code = lambda: f"P{random.randrange(size):07d}"
+    airport_code = lambda: f"A{random.randrange(1000):03d}"
+    now = datetime.utcnow
+    return [
+        ("users.find_one principal by email (auth)",
+         lambda: {"find": "users", "filter": {"email": email()}, "projection": PRINCIPAL_PROJECTION, "limit": 1}),
+        ("users.find_one by email (login)",
+         lambda: {"find": "users", "filter": {"email": email()}, "projection": LOGIN_PROJECTION, "limit": 1}),
+        ("users.find_one _id by email (register)",
+         lambda: {"find": "users", "filter": {"email": email()}, "projection": {"_id": 1}, "limit": 1}),
+        ("users.update_one by email (preferences)",
+         lambda: {"update": "users", "updates": [{"q": {"email": email()}, "u": {"$set": {"location": "BCN"}}}]}),
+        ("users.find by email $in (group pricing)",
+         lambda: {"find": "users", "filter": {"email": {"$in": [email() for _ in range(6)]}},
+                  "projection": {"_id": 0, "email": 1, "location": 1}}),
+        ("plans.find_one by code",
+         lambda: {"find": "plans", "filter": {"code": code()}, "limit": 1}),
+        ("plans.find_one status by code (covered)",
+         lambda: {"find": "plans", "filter": {"code": code()}, "projection": plan_status_cache.projection,
+                  "hint": sort_spec(plan_status_cache.find_options["hint"]), "limit": 1},
+         {"covered": True}),
+        ("plans.find_one suggestions by code (podium)",
+         lambda: {"find": "plans", "filter": {"code": code()}, "projection": PODIUM_PROJECTION, "limit": 1}),
+        ("plans.find by users.email (plan list)",
+         lambda: {"find": "plans", "filter": {"users.email": email()}}),
+        # Walks the activity index and skips plans that have started
+        ("plans.find active by last_activity_at (price prefetch)",
+         lambda: {"find": "plans", "filter": active_plans_filter(now()), "projection": ACTIVE_PLAN_PROJECTION,
+                  "sort": sort_spec(ACTIVE_PLANS_SORT), "limit": PRICE_PREFETCH_MAX_PLANS},
+         {"max_examined": 2 * PRICE_PREFETCH_MAX_PLANS}),
+        ("plans.findAndModify by code, not a member (join)",
+         lambda: {"findAndModify": "plans", "query": join_filter(code(), email()),
+                  "update": {"$push": {"users": {"email": "check@example.com"}}, "$inc": {"version": 1}},
+                  "new": True}),
+        ("plans.update_one by code",
+         lambda: {"update": "plans", "updates": [{"q": {"code": code()}, "u": {"$set": {"description": ""}}}]}),
+        ("plans.update_one by users.email and code (quiz)",
+         lambda: {"update": "plans", "updates": [{"q": member_filter(code(), email()),
+                                                  "u": {"$set": {"description": ""}}}]}),
+        ("plans.update_one first vote by code and $elemMatch",
+         lambda: {"update": "plans", "updates": [{
+             "q": first_vote_filter(code(), airport_code(), email()),
+             "u": {"$set": {"users.$[user].has_voted": True},
+                   "$inc": {"suggested_destinations.$[destination].likes": 1, "total_likes": 1,
+                            "voted_count": 1, "version": 1}},
+             "arrayFilters": [{"user.email": email()}, {"destination.airport_code": "A000"}]}]}),
+        ("plans.update_one first quiz completion by code and $elemMatch",
+         lambda: {"update": "plans", "updates": [{
+             "q": first_quiz_completion_filter(code(), email()),
+             "u": {"$set": {"users.$.is_quiz_completed": True}, "$inc": {"quiz_completed_count": 1, "version": 1}}}]}),
+        ("destinations.find_one by airport_code",
+         lambda: {"find": "destinations", "filter": {"airport_code": airport_code()},
+                  "projection": {"embedding": 0}, "limit": 1}),
+        ("flight_prices.find by _id $in (suggestion prices)",
+         lambda: {"find": "flight_prices",
+                  "filter": routes_filter(seed_route(random.randrange(1000 * ROUTES_PER_DESTINATION))
+                                          for _ in range(20))}),
+        # Sorted across the two $or branches, so it examines every runnable job
+        ("quiz_jobs.findAndModify runnable (lease claim)",
+         lambda: {"findAndModify": "quiz_jobs", "query": runnable_jobs_filter(now()),
+                  "sort": sort_spec(CLAIM_SORT), "update": {"$set": {"lease_owner": "check"}}},
+         {"max_examined": RUNNABLE_JOBS}),
+    ]
+
+
+def stages(plan):
+    """Collect every stage name in an explain plan tree."""
+    found = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            found.append(plan["stage"])
+        for value in plan.values():
+            found.extend(stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            found.extend(stages(value))
+    return found
+
+
+def lookup(command):
+    """The read part of a write command, to time it without writing."""
+    if "update" in command and "updates" in command:
+        return {"find": command["update"], "filter": command["updates"][0]["q"], "limit": 1}
+    if "findAndModify" in command:
+        return {"find": command["findAndModify"], "filter": command["query"],
+                "sort": command.get("sort", {}), "limit": 1}
+    return command
+
+
+def check(db, name, make_command, repetitions, max_examined=None, covered=False):
+    explain = db.command("explain", make_command(), verbosity="executionStats")
+    plan_stages = stages(explain["queryPlanner"]["winningPlan"])
+    execution = explain["executionStats"]
+    examined, returned = execution["totalDocsExamined"], execution["nReturned"]
+
+    problems = []
+    if "COLLSCAN" in plan_stages:
+        problems.append("COLLSCAN")
+    if "IXSCAN" not in plan_stages and "IDHACK" not in plan_stages and "EXPRESS_IXSCAN" not in plan_stages:
+        problems.append("no IXSCAN")
+    if covered and (examined or "FETCH" in plan_stages):
+        problems.append(f"not covered: docsExamined {examined}")
+    if examined > (max_examined or max(returned, 1)):
+        problems.append(f"docsExamined {examined} > {'limit ' if max_examined else 'nReturned '}"
+                        f"{max_examined or returned}")
+
+    latencies = []
+    for _ in range(repetitions):
+        # Time the lookup part of writes without writing
+        command = lookup(make_command())
+        start = time.perf_counter()
+        db.command(command)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+    status = "FAIL " + ", ".join(problems) if problems else "ok"
+    print(f"{name:<52} {'>'.join(dict.fromkeys(plan_stages)):<28} examined {examined:>3} returned {returned:>3} "
+          f"p50 {p50:6.2f} ms p99 {p99:6.2f} ms  {status}")
+    return not problems
+
+
+async def create_indexes():
+    await mongodb.connect_to_mongo()
+    await mongodb.ensure_indexes()
+    await mongodb.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--repetitions", type=int, default=200)
+    args = parser.parse_args()
+
+    db = MongoClient(mongodb.MONGO_URI)[mongodb.DB_NAME]
+    seed(db, args.size)
+    asyncio.run(create_indexes())
+
+    print(f"Checking query plans on {mongodb.DB_NAME} ({datetime.utcnow().isoformat()})")
+    results = []
+    for name, make_command, *expectations in query_shapes(args.size):
+        results.append(check(db, name, make_command, args.repetitions, **(expectations[0] if expectations else {})))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Check that concurrent joins of one plan neither lose nor duplicate members.
+
+Seeds users and a plan into a scratch database on a local MongoDB, then
+has every user open the plan at once through GET /plan/{code} (in-process,
+over ASGI), each user twice. Exits non-zero unless every user ends up in
+the plan exactly once, the plan version grew by exactly one per join, and
+a further round of GETs by members wrote nothing.
+
+Usage:
+    python -m benchmarks.concurrent_join --users 500
+"""
+import os
+
+# Never run against the application database
+os.environ["DB_NAME"] = os.getenv("CONCURRENT_JOIN_DB_NAME", "planeit_concurrent_join")
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+import httpx
+from main import app
+from app.db import mongodb
+from app.routers.auth import create_access_token
+
+CODE = "JOIN01"
+
+
+async def seed(users):
+    await mongodb.get_users_collection().delete_many({})
+    await mongodb.get_plans_collection().delete_many({})
+    await mongodb.get_users_collection().insert_many([
+        {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x", "location": ""}
+        for i in range(users + 1)
+    ])
+    creator = {"name": "User 0", "email": "user0@example.com", "is_quiz_completed": False,
+               "top_destinations": [], "has_voted": False}
+    await mongodb.get_plans_collection().insert_one({
+        "name": "Concurrent join", "description": "", "code": CODE,
+        "startDate": "2030-07-01T00:00:00", "endDate": "2030-07-08T00:00:00",
+        "users": [creator], "creator": creator, "suggested_destinations": [], "version": 1,
+    })
+
+
+async def open_plan(client, email):
+    token = create_access_token({"sub": email})
+    response = await client.get(f"/plan/{CODE}", headers={"Authorization": f"Bearer {token}"})
+    return response.status_code
+
+
+async def run(users):
+    await mongodb.connect_to_mongo()
+    try:
+        await seed(users)
+        emails = [f"user{i}@example.com" for i in range(1, users + 1)]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            statuses = await asyncio.gather(*(open_plan(client, email) for email in emails * 2))
+            elapsed = time.perf_counter() - start
+
+            plan = await mongodb.get_plans_collection().find_one({"code": CODE})
+            counts = Counter(user["email"] for user in plan["users"])
+            missing = [email for email in emails if email not in counts]
+            duplicated = [email for email, count in counts.items() if count > 1]
+            print(f"{len(statuses)} concurrent GETs by {users} joining users in {elapsed:.2f} s: "
+                  f"{len(plan['users'])} members, version {plan['version']}, "
+                  f"{len(missing)} missing, {len(duplicated)} duplicated, "
+                  f"statuses {dict(Counter(statuses))}")
+
+            # Members only read
+            await asyncio.gather(*(open_plan(client, email) for email in emails))
+            after = await mongodb.get_plans_collection().find_one({"code": CODE}, {"version": 1})
+            print(f"after a round of member GETs: version {after['version']}")
+
+        return (set(statuses) == {200} and not missing and not duplicated
+                and len(plan["users"]) == users + 1 and plan["version"] == users + 1
+                and after["version"] == plan["version"])
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.users)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Top-k overlap and ranking latency for shortened embeddings.
+
+Loads the full-size destination embeddings and user preference vectors
+from MongoDB, shortens both to each candidate size by truncation and
+re-normalisation (what EMBEDDING_DIMENSIONS does) and compares each
+user's top-k destinations against the full-size ranking. Users without
+preferences fall back to using destinations as queries.
+
+--synthetic uses random clustered vectors instead. Random vectors have
+no coarse-to-fine structure, so only its latency and size numbers mean
+anything.
+
+Usage:
+    python -m benchmarks.evaluate_embedding_dimensions --dims 256 512 1536 --k 25
+"""
+import argparse
+import time
+import numpy as np
+from pymongo import MongoClient
+from app.db import mongodb
+from app.services.destination_index import ExactIndex, create_destination_index
+
+
+def load_vectors(max_queries):
+    db = MongoClient(mongodb.MONGO_URI)[mongodb.DB_NAME]
+    destinations = list(db.destinations.find({"embedding": {"$nin": [None, []]}},
+                                             {"_id": 0, "airport_code": 1, "embedding": 1}))
+    users = list(db.users.find({"preferences.0": {"$exists": True}}, {"_id": 0, "preferences": 1})
+                 .limit(max_queries))
+    keys = [d["airport_code"] for d in destinations]
+    vectors = np.asarray([d["embedding"] for d in destinations], dtype=np.float32)
+    queries = np.asarray([u["preferences"] for u in users if len(u["preferences"]) == vectors.shape[1]],
+                         dtype=np.float32)
+    if len(queries) == 0:
+        print("No user preference vectors found, using destinations as queries")
+        queries = vectors[:max_queries]
+    return keys, vectors, queries
+
+
+def synthetic_vectors(size, dim, max_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(50, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, 50, size)] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, 50, max_queries)] + 0.5 * rng.normal(size=(max_queries, dim)).astype(np.float32)
+    return [f"D{i:06d}" for i in range(size)], vectors, queries
+
+
+def shorten(vectors, dim):
+    head = vectors[..., :dim]
+    norms = np.linalg.norm(head, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return head / norms
+
+
+def rank(index, queries, k):
+    start = time.perf_counter()
+    results = [[key for key, _ in index.search(query, k)] for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1536])
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--size", type=int, default=1000, help="Catalogue size with --synthetic")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        keys, vectors, queries = synthetic_vectors(args.size, max(args.dims), args.queries)
+    else:
+        keys, vectors, queries = load_vectors(args.queries)
+    if len(keys) == 0:
+        raise SystemExit("No destination embeddings found, seed the catalogue or use --synthetic")
+
+    full_dim = vectors.shape[1]
+    print(f"{len(keys)} destinations, {len(queries)} queries, full size {full_dim}")
+
+    reference = ExactIndex()
+    reference.add(keys, vectors)
+    truth, _ = rank(reference, queries, args.k)
+
+    for dim in sorted(set(args.dims)):
+        if dim > full_dim:
+            print(f"{dim:>5} dims: skipped, stored vectors only have {full_dim}")
+            continue
+        short_vectors, short_queries = shorten(vectors, dim), shorten(queries, dim)
+
+        exact = ExactIndex()
+        exact.add(keys, short_vectors)
+        results, exact_ms = rank(exact, short_queries, args.k)
+        overlap = np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)])
+        top1 = np.mean([r[0] == t[0] for r, t in zip(results, truth)])
+
+        index = create_destination_index()
+        index.add(keys, short_vectors)
+        _, index_ms = rank(index, short_queries, args.k)
+
+        print(f"{dim:>5} dims: top-{args.k} overlap {overlap:.3f}  top-1 agreement {top1:.3f}  "
+              f"exact {exact_ms:.3f} ms/query  {index.kind} {index_ms:.3f} ms/query  "
+              f"{dim * 4} B/vector  matrix {short_vectors.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Login load test against a running server.
+
+Measures login throughput under concurrent load, and the p50/p99 latency
+of a cheap endpoint (/health) with and without that load, to show that
+password hashing stays off the event loop.
+
+Usage:
+    python serve.py &
+    python -m benchmarks.load_test_login --url http://localhost:8000 --concurrency 32 --seconds 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+import aiohttp
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else float("nan")
+
+
+async def probe_health(session, url, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with session.get(f"{url}/health") as response:
+            await response.read()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def login_loop(session, url, credentials, stop, counts):
+    while not stop.is_set():
+        async with session.post(f"{url}/auth/login", json=credentials) as response:
+            await response.read()
+            counts[response.status] = counts.get(response.status, 0) + 1
+
+
+async def measure_health(session, url, seconds):
+    stop = asyncio.Event()
+    latencies = []
+    task = asyncio.create_task(probe_health(session, url, stop, latencies))
+    await asyncio.sleep(seconds)
+    stop.set()
+    await task
+    return latencies
+
+
+async def run(url, concurrency, seconds):
+    async with aiohttp.ClientSession() as session:
+        credentials = {"email": f"loadtest-{uuid.uuid4().hex[:8]}@example.com", "password": "load-test-password"}
+        async with session.post(f"{url}/auth/register", json={"name": "Load Test", **credentials}) as response:
+            response.raise_for_status()
+
+        idle = await measure_health(session, url, min(seconds, 5))
+        print(f"/health idle:       p50 {percentile(idle, 0.5):7.2f} ms  p99 {percentile(idle, 0.99):7.2f} ms")
+
+        stop = asyncio.Event()
+        counts = {}
+        loaded = []
+        start = time.perf_counter()
+        workers = [asyncio.create_task(login_loop(session, url, credentials, stop, counts)) for _ in range(concurrency)]
+        workers.append(asyncio.create_task(probe_health(session, url, stop, loaded)))
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - start
+
+        print(f"/health under load: p50 {percentile(loaded, 0.5):7.2f} ms  p99 {percentile(loaded, 0.99):7.2f} ms")
+        print(f"logins: {counts.get(200, 0) / elapsed:.1f}/s successful, responses by status {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.url.rstrip("/"), args.concurrency, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
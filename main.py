@@ -1,12 +1,30 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import user, auth, plan, utils
-from app.db.mongodb import connect_to_mongo, close_mongo_connection, get_destinations_collection
+from app.routers import user, auth, plan, utils, admin
+import asyncio
+import logging
+from app.db.mongodb import connect_to_mongo, close_mongo_connection, ensure_indexes
 from app.services.openai_service import OpenAIService
 from app.models.destination import seed_destinations
-from app.data.destinations import destinations
+from app.services.destination_catalogue import reload_catalogue, watch_catalogue_version, CATALOGUE_POLL_SECONDS
+from app.services import readiness
+from app.services.profiler import install_profiler
+from app.services.tracing import setup_tracing, shutdown_tracing
+from app.services.quiz_jobs import start_quiz_workers
+from app.services.price_prefetcher import run_price_prefetcher, PRICE_PREFETCH_ENABLED
+from app.services.invalidation import run_invalidation_bus
+from app.services.plan_counters import backfill_plan_counters
+from app.config import settings
 
-app = FastAPI(title="HackUPC API")
+logger = logging.getLogger(__name__)
+
+# Delay before retrying a failed background warm-up step, doubled after
+# each further failure up to WARMUP_RETRY_MAX_SECONDS
+WARMUP_RETRY_SECONDS = settings.get_float("WARMUP_RETRY_SECONDS", 10)
+WARMUP_RETRY_MAX_SECONDS = settings.get_float("WARMUP_RETRY_MAX_SECONDS", 300)
+
+app = FastAPI(title="HackUPC API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -17,27 +35,88 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Opt-in request profiling; nothing is installed unless PROFILING_ENABLED
+install_profiler(app)
+
+# Opt-in OpenTelemetry tracing; nothing is installed unless TRACING_ENABLED
+setup_tracing(app)
+
+async def prepare_destinations():
+    """
+    Seed destinations, generate missing embeddings and load the catalogue
+    """
+    if not readiness.is_ready("destinations"):
+        await seed_destinations()
+        readiness.mark_ready("destinations")
+    if not readiness.is_ready("embeddings"):
+        if not await OpenAIService.generate_destination_embeddings():
+            raise RuntimeError("destination embeddings not generated, see logs")
+        readiness.mark_ready("embeddings")
+    await reload_catalogue(force=True)
+    readiness.mark_ready("catalogue")
+
+async def backfill_counters():
+    """
+    Store the status counters on plans created before they existed
+    """
+    try:
+        await backfill_plan_counters()
+    except Exception as e:
+        logger.error(f"Error backfilling plan counters: {str(e)}")
+
+async def warm_up():
+    """
+    Background warm-up, retried with exponential backoff until every step
+    has succeeded
+    """
+    delay = WARMUP_RETRY_SECONDS
+    while True:
+        try:
+            await prepare_destinations()
+            return
+        except Exception as e:
+            step = next((name for name in readiness.SUBSYSTEMS if not readiness.is_ready(name)), "catalogue")
+            readiness.mark_failed(step, str(e))
+            logger.info(f"Retrying warm-up in {delay:.0f} s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
 # Database events
 @app.on_event("startup")
 async def startup_db_client():
+    # Only the Mongo connection is on the critical path; everything else
+    # warms up in the background and is reported by /ready
     await connect_to_mongo()
-    await seed_destinations()
-    await OpenAIService.generate_destination_embeddings()
-    destinations_collection = get_destinations_collection()
-    for destination in destinations:
-        tmp = await destinations_collection.find_one({"airport_code": destination['airport_code']})
-        destination['embedding'] = tmp['embedding']
+    await ensure_indexes()
+    readiness.mark_ready("mongo")
+
+    app.state.background_tasks = [asyncio.create_task(backfill_counters())]
+    # The production launcher (serve.py) loads the catalogue once before
+    # forking; only dev-mode processes load it themselves
+    if not readiness.is_ready("catalogue"):
+        app.state.background_tasks.append(asyncio.create_task(warm_up()))
+    if CATALOGUE_POLL_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(watch_catalogue_version()))
+    app.state.background_tasks.extend(start_quiz_workers())
+    # Evicts this worker's cached documents when any worker writes them
+    app.state.background_tasks.append(asyncio.create_task(run_invalidation_bus()))
+    if PRICE_PREFETCH_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(run_price_prefetcher()))
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
     await close_mongo_connection()
+    shutdown_tracing()
 
 # Include routers
 app.include_router(user.router)
 app.include_router(auth.router)
 app.include_router(plan.router)
 app.include_router(utils.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def read_root():
@@ -47,6 +126,20 @@ async def read_root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once every subsystem has warmed up, 503 until then
+    """
+    report = readiness.readiness_report()
+    if report["status"] != "ready":
+        return ORJSONResponse(
+            report,
+            status_code=503,
+            headers={"Retry-After": str(readiness.READY_RETRY_AFTER_SECONDS)},
+        )
+    return report
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
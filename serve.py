@@ -0,0 +1,85 @@
+"""
+Production entry point.
+
+Runs the app under gunicorn with uvicorn workers (uvloop + httptools).
+The destination catalogue and its embedding index are loaded once in the
+master process before forking, so every worker shares them copy-on-write
+instead of repeating the Mongo seeding, embedding check and index build.
+
+Usage:
+    WEB_CONCURRENCY=4 python serve.py
+"""
+import os
+import gc
+import asyncio
+import logging
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+HOST = settings.get("HOST", "0.0.0.0")
+PORT = settings.get_int("PORT", 8000)
+WEB_CONCURRENCY = settings.get_int("WEB_CONCURRENCY", os.cpu_count() or 1)
+# Seconds workers get to finish in-flight requests after SIGTERM
+GRACEFUL_TIMEOUT = settings.get_int("GRACEFUL_TIMEOUT", 30)
+WORKER_TIMEOUT = settings.get_int("WORKER_TIMEOUT", 120)
+KEEPALIVE = settings.get_int("KEEPALIVE", 5)
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def preload():
+    """
+    Load the destination catalogue in the master process.
+
+    The Mongo client used here is closed again before forking; each worker
+    opens its own connection in the startup event. If a step fails here,
+    the workers retry it in their background warm-up.
+    """
+    import main
+    from app.db.mongodb import connect_to_mongo, close_mongo_connection
+
+    async def run():
+        await connect_to_mongo()
+        try:
+            await main.prepare_destinations()
+        except Exception as e:
+            logger.error(f"Preloading destinations failed, workers will retry: {str(e)}")
+        finally:
+            await close_mongo_connection()
+
+    asyncio.run(run())
+    # Move everything allocated so far out of the collector's reach so
+    # that garbage collection in the workers doesn't dirty the shared pages
+    gc.freeze()
+    return main.app
+
+
+class PlaneItApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return preload()
+
+
+if __name__ == "__main__":
+    logger.info(f"Starting {WEB_CONCURRENCY} workers on {HOST}:{PORT}")
+    PlaneItApplication({
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": ProductionUvicornWorker,
+        "preload_app": True,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": WORKER_TIMEOUT,
+        "keepalive": KEEPALIVE,
+    }).run()
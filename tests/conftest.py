@@ -0,0 +1,46 @@
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.db import mongodb
+from app.services import readiness
+from app.services.local_cache import all_caches
+from app.routers.auth import create_access_token
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """
+    An in-memory database in place of MongoDB
+    """
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(mongodb, "client", client)
+    monkeypatch.setattr(mongodb, "db", client["planeit_test"])
+    monkeypatch.setattr(readiness, "_states", {name: readiness.PENDING for name in readiness.SUBSYSTEMS})
+    monkeypatch.setattr(readiness, "_errors", {})
+    for cache in all_caches():
+        cache.clear()
+    return mongodb.db
+
+
+@pytest.fixture
+async def client(db):
+    """
+    Client for the app, without running its startup handlers
+    """
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def auth_headers(db):
+    await mongodb.get_users_collection().insert_one(
+        {"name": "Ana", "email": "ana@example.com", "password": "x", "location": "BCN"}
+    )
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'ana@example.com'})}"}
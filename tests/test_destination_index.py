@@ -0,0 +1,26 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.services.destination_index import DestinationIndex, build_destination_index
+
+
+def destinations(count):
+    rng = np.random.default_rng(0)
+    return [
+        {"airport_code": f"A{i:03d}", "embedding": rng.standard_normal(8).tolist()}
+        for i in range(count)
+    ]
+
+
+def test_concurrent_saves_publish_a_complete_index(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = build_destination_index(destinations(50), version=3)
+
+    # Workers rebuilding the index at once each write their own temporary file
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: index.save(path), range(32)))
+
+    loaded = DestinationIndex.load(path)
+    assert loaded.keys == index.keys
+    assert np.array_equal(loaded.vectors, index.vectors)
+    assert os.listdir(tmp_path) == ["index.npz"]
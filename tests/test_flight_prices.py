@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import pytest
+from app.db.mongodb import get_flight_prices_collection
+from app.services.amadeus_service import AmadeusService, AmadeusUnavailable
+from app.services.flight_price_service import FlightPriceService, route_id
+
+pytestmark = pytest.mark.anyio
+
+STORED = ("BCN", "LIS", "2030-07-01", "2030-07-08", 2)
+MISSING = ("BCN", "OPO", "2030-07-01", "2030-07-08", 2)
+
+
+@pytest.fixture
+async def fetched(db, monkeypatch):
+    """
+    Routes fetched from Amadeus, each priced at 100
+    """
+    fetched = []
+
+    async def refresh_routes(routes):
+        fetched.extend(routes)
+        return {route: 100.0 for route in routes}
+
+    monkeypatch.setattr(FlightPriceService, "refresh_routes", staticmethod(refresh_routes))
+    await get_flight_prices_collection().insert_one(
+        {"_id": route_id(STORED), "price": 80.0, "fetched_at": datetime.utcnow() - timedelta(days=30)}
+    )
+    return fetched
+
+
+async def test_missing_prices_are_fetched_while_the_prefetcher_refreshes_stale_ones(fetched):
+    prices = await FlightPriceService.get_route_prices([STORED, MISSING], refresh_stale=False)
+    assert prices == {STORED: 80.0, MISSING: 100.0}
+    assert fetched == [MISSING]
+
+
+async def test_stale_prices_are_refreshed_by_default(fetched):
+    prices = await FlightPriceService.get_route_prices([STORED, MISSING])
+    assert prices == {STORED: 100.0, MISSING: 100.0}
+
+
+@pytest.fixture
+def amadeus(db, monkeypatch):
+    """
+    Amadeus answers with the queued results, raising exceptions
+    """
+    results = []
+
+    async def get_cheapest_quotes(**kwargs):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(AmadeusService, "get_cheapest_quotes", staticmethod(get_cheapest_quotes))
+    return results
+
+
+async def test_rejected_calls_keep_the_stored_price(amadeus):
+    await get_flight_prices_collection().insert_one(
+        {"_id": route_id(STORED), "price": 80.0, "fetched_at": datetime.utcnow() - timedelta(days=30)}
+    )
+    amadeus.extend([AmadeusUnavailable("circuit open"), AmadeusUnavailable("circuit open")])
+
+    prices = await FlightPriceService.get_route_prices([STORED, MISSING])
+
+    assert prices == {STORED: 80.0, MISSING: None}
+    stored = await get_flight_prices_collection().find_one({"_id": route_id(STORED)})
+    assert stored["price"] == 80.0
+    assert stored["fetched_at"] < datetime.utcnow() - timedelta(days=1)
+    assert await get_flight_prices_collection().find_one({"_id": route_id(MISSING)}) is None
+
+
+async def test_routes_without_offers_are_stored_as_misses(amadeus):
+    amadeus.append(None)
+
+    prices = await FlightPriceService.get_route_prices([MISSING])
+
+    assert prices == {MISSING: None}
+    stored = await get_flight_prices_collection().find_one({"_id": route_id(MISSING)})
+    assert stored["price"] is None
@@ -0,0 +1,10 @@
+from benchmarks.check_import_time import BUDGET_MS, eager_modules, import_time_ms
+
+
+def test_heavy_dependencies_are_imported_on_first_use():
+    assert eager_modules() == []
+
+
+def test_importing_the_app_stays_within_the_budget():
+    # The first run also warms the bytecode and filesystem caches
+    assert min(import_time_ms() for _ in range(3)) <= BUDGET_MS
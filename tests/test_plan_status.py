@@ -0,0 +1,83 @@
+import pytest
+from app.db.mongodb import get_plans_collection, get_users_collection
+from app.routers.auth import create_access_token
+from app.services.plan_counters import MISSING_COUNTERS
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def ignore_index_hints(monkeypatch):
+    """
+    mongomock doesn't take the index hint of the covered status query
+    """
+    from mongomock import collection
+    find = collection.Collection.find
+    monkeypatch.setattr(collection.Collection, "find",
+                        lambda self, *args, hint=None, **kwargs: find(self, *args, **kwargs))
+
+
+@pytest.fixture
+def plan_without_counters(db):
+    """
+    A plan stored before the status counters existed
+    """
+    return {
+        "name": "Lisbon", "description": "", "code": "OLD001",
+        "startDate": "2030-07-01T00:00:00", "endDate": "2030-07-08T00:00:00",
+        "creator": {"name": "Bo", "email": "bo@example.com", "is_quiz_completed": True},
+        "users": [
+            {"name": "Bo", "email": "bo@example.com", "is_quiz_completed": True, "has_voted": True},
+            {"name": "Cy", "email": "cy@example.com", "is_quiz_completed": True, "has_voted": False},
+            {"name": "Di", "email": "di@example.com", "is_quiz_completed": False, "has_voted": False},
+        ],
+        "suggested_destinations": [
+            {"city": "Lisbon", "country": "Portugal", "description": "", "airport_code": "LIS", "likes": 1},
+            {"city": "Porto", "country": "Portugal", "description": "", "airport_code": "OPO", "likes": 2},
+        ],
+        "version": 4,
+    }
+
+
+async def test_status_of_a_plan_without_counters_is_computed(client, auth_headers, plan_without_counters):
+    await get_plans_collection().insert_one(plan_without_counters)
+
+    response = await client.get("/plan/OLD001/status", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "code": "OLD001", "member_count": 3, "quiz_completed_count": 2,
+        "voted_count": 1, "total_likes": 3, "version": 4,
+    }
+
+
+async def test_status_of_a_plan_joined_before_the_backfill_is_computed(client, auth_headers, plan_without_counters):
+    await get_plans_collection().insert_one(plan_without_counters)
+
+    # Ana joins: the join stores member_count 1 by $inc, the other
+    # counters are still missing
+    assert (await client.get("/plan/OLD001", headers=auth_headers)).status_code == 200
+    assert await get_plans_collection().count_documents(MISSING_COUNTERS) == 1
+
+    response = await client.get("/plan/OLD001/status", headers=auth_headers)
+    assert response.json()["member_count"] == 4
+    assert response.json()["quiz_completed_count"] == 2
+
+
+async def test_status_of_an_unknown_plan(client, auth_headers):
+    response = await client.get("/plan/NOPE00/status", headers=auth_headers)
+    assert response.status_code == 404
+
+
+async def test_status_reflects_a_join_on_the_same_worker(client, auth_headers):
+    created = await client.post("/plan/", headers=auth_headers, json={
+        "name": "Lisbon", "description": "", "startDate": "2030-07-01", "endDate": "2030-07-08"
+    })
+    code = created.json()["code"]
+    assert (await client.get(f"/plan/{code}/status", headers=auth_headers)).json()["member_count"] == 1
+
+    await get_users_collection().insert_one({"name": "Bo", "email": "bo@example.com", "password": "x", "location": ""})
+    bo_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bo@example.com'})}"}
+    assert (await client.get(f"/plan/{code}", headers=bo_headers)).status_code == 200
+
+    # No invalidation bus runs here; the joining request evicted the entry itself
+    assert (await client.get(f"/plan/{code}/status", headers=auth_headers)).json()["member_count"] == 2
@@ -0,0 +1,25 @@
+from app.services.price_prefetcher import plan_routes
+
+PLAN = {
+    "startDate": "2030-07-01T00:00:00",
+    "endDate": "2030-07-08T00:00:00",
+    "users": [{"email": "ana@example.com"}, {"email": "joao@example.com"}, {"email": "marta@example.com"}],
+    "suggested_destinations": [{"airport_code": "LIS"}],
+}
+LOCATIONS = {"ana@example.com": "BCN", "joao@example.com": "OPO", "marta@example.com": None}
+
+
+def test_routes_follow_the_default_user_pricing():
+    assert plan_routes(PLAN, LOCATIONS, group_pricing=False) == [
+        ("BCN", "LIS", "2030-07-01", "2030-07-08", 3),
+        ("OPO", "LIS", "2030-07-01", "2030-07-08", 3),
+    ]
+
+
+def test_group_pricing_routes_are_opt_in():
+    assert plan_routes(PLAN, LOCATIONS, group_pricing=True) == [
+        ("BCN", "LIS", "2030-07-01", "2030-07-08", 1),
+        ("BCN", "LIS", "2030-07-01", "2030-07-08", 3),
+        ("OPO", "LIS", "2030-07-01", "2030-07-08", 1),
+        ("OPO", "LIS", "2030-07-01", "2030-07-08", 3),
+    ]
@@ -0,0 +1,27 @@
+import asyncio
+import time
+import pytest
+from app.services.resilience import TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_queued_callers_wait_for_their_own_token_in_parallel():
+    bucket = TokenBucket(rate=10, capacity=1)
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(bucket.acquire(max_wait=0.5) for _ in range(10)))
+    elapsed = time.monotonic() - start
+
+    # The burst token plus five refilled within 0.5 s; the rest are rejected
+    assert results.count(True) == 6
+    assert elapsed < 0.8
+
+
+async def test_rejects_without_waiting_when_the_wait_is_too_long():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert await bucket.acquire(max_wait=0.1)
+
+    start = time.monotonic()
+    assert not await bucket.acquire(max_wait=0.1)
+    assert time.monotonic() - start < 0.05
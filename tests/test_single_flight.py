@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+CALLERS = 50
+
+
+class Upstream:
+    """
+    Upstream call that counts its requests and fails for "boom"
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, value):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if value == "boom":
+            raise RuntimeError("upstream failed")
+        return value
+
+
+async def test_identical_concurrent_calls_make_one_upstream_request():
+    upstream = Upstream()
+    group = SingleFlight("test")
+
+    results = await asyncio.gather(*(group.do("key", upstream, "ok") for _ in range(CALLERS)))
+
+    assert results == ["ok"] * CALLERS
+    assert upstream.calls == 1
+    assert group.stats() == {"calls": 1, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+async def test_upstream_errors_reach_every_waiter():
+    upstream = Upstream()
+    group = SingleFlight("test")
+
+    errors = await asyncio.gather(*(group.do("key", upstream, "boom") for _ in range(CALLERS)),
+                                  return_exceptions=True)
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert upstream.calls == 1
+
+
+async def test_completed_calls_are_not_cached():
+    upstream = Upstream()
+    group = SingleFlight("test")
+
+    await group.do("key", upstream, "ok")
+    await group.do("key", upstream, "ok")
+
+    assert upstream.calls == 2
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    upstream = Upstream()
+    group = SingleFlight("test")
+
+    first = asyncio.ensure_future(group.do("key", upstream, "ok"))
+    second = asyncio.ensure_future(group.do("key", upstream, "ok"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "ok"
+    assert upstream.calls == 1
@@ -0,0 +1,33 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+PREFERENCES = {"preferences": [{"question": "Beach or mountains?", "answer": "Beach"}], "location": "BCN"}
+
+
+async def test_enqueue_preferences_requires_authentication(client):
+    response = await client.post("/user/ABC123/preferences", json=PREFERENCES)
+    assert response.status_code == 401
+
+
+async def test_enqueue_preferences_rejects_an_invalid_token(client):
+    response = await client.post("/user/ABC123/preferences", json=PREFERENCES,
+                                 headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+async def test_quiz_job_status_requires_authentication(client):
+    response = await client.get("/user/jobs/some-job")
+    assert response.status_code == 401
+
+
+async def test_quiz_job_status_of_an_unknown_job(client, auth_headers):
+    response = await client.get("/user/jobs/some-job", headers=auth_headers)
+    assert response.status_code == 404
+
+
+async def test_stream_preferences_requires_authentication(client, monkeypatch):
+    from app.services import readiness
+    monkeypatch.setitem(readiness._states, "catalogue", readiness.READY)
+    response = await client.post("/user/ABC123/preferences/stream", json=PREFERENCES)
+    assert response.status_code == 401
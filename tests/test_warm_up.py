@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import main
+from app.services import openai_service, readiness
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowOpenAI:
+    """
+    Async OpenAI client whose profile requests wait until released
+    """
+
+    def __init__(self):
+        self.called = asyncio.Event()
+        self.release = asyncio.Event()
+        self.responses = SimpleNamespace(create=self.create_response)
+        self.embeddings = SimpleNamespace(create=self.create_embedding)
+
+    async def create_response(self, **kwargs):
+        self.called.set()
+        await self.release.wait()
+        return SimpleNamespace(output_text="A relaxed, walkable city.")
+
+    async def create_embedding(self, **kwargs):
+        return SimpleNamespace(data=[SimpleNamespace(index=0, embedding=[0.1] * 8)])
+
+
+async def test_health_answers_while_warm_up_waits_on_openai(client, monkeypatch):
+    slow_openai = SlowOpenAI()
+    monkeypatch.setattr(openai_service, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(openai_service, "openai_client", lambda asynchronous=False: slow_openai)
+
+    warm_up = asyncio.create_task(main.warm_up())
+    try:
+        await asyncio.wait_for(slow_openai.called.wait(), timeout=5)
+
+        health = await asyncio.wait_for(client.get("/health"), timeout=1)
+        assert health.status_code == 200
+        ready = await asyncio.wait_for(client.get("/ready"), timeout=1)
+        assert ready.status_code == 503
+        assert ready.json()["subsystems"]["embeddings"] == "pending"
+
+        slow_openai.release.set()
+        await asyncio.wait_for(warm_up, timeout=30)
+        assert (await client.get("/ready")).json()["subsystems"]["embeddings"] == "ready"
+    finally:
+        warm_up.cancel()
+
+
+class FlakyOpenAI(SlowOpenAI):
+    """
+    Async OpenAI client whose first profile requests fail
+    """
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.release.set()
+
+    async def create_response(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("OpenAI unavailable")
+        return await super().create_response(**kwargs)
+
+
+async def test_embeddings_are_only_ready_once_generated(client, monkeypatch):
+    flaky_openai = FlakyOpenAI(failures=2)
+    monkeypatch.setattr(openai_service, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(openai_service, "openai_client", lambda asynchronous=False: flaky_openai)
+    monkeypatch.setattr(main, "WARMUP_RETRY_SECONDS", 0.01)
+    readiness.mark_ready("mongo")
+    states = []
+
+    async def sleep(delay):
+        states.append((readiness.readiness_report()["subsystems"]["embeddings"], delay))
+
+    monkeypatch.setattr(main, "asyncio", SimpleNamespace(sleep=sleep))
+
+    await asyncio.wait_for(main.warm_up(), timeout=30)
+
+    assert states == [("failed", 0.01), ("failed", 0.02)]
+    ready = (await client.get("/ready")).json()
+    assert ready["subsystems"]["embeddings"] == "ready"
+    assert ready["errors"] == {}